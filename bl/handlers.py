@@ -4,7 +4,7 @@ BlenderFDS, handlers
 
 import bpy, logging
 from bpy.app.handlers import persistent, load_post, save_pre, depsgraph_update_post
-from bpy.types import Object
+from bpy.types import Object, Scene
 
 from .. import geometry
 from .. import config
@@ -111,6 +111,7 @@ def _load_post(self):
 
     # Remove all caches and tmp objects, clean up to remove stale caches
     geometry.utils.rm_geometric_caches()
+    geometry.utils.rm_legacy_geometric_caches()
     geometry.utils.rm_tmp_objects()
 
     # Init FDS default materials
@@ -133,8 +134,7 @@ def _save_pre(self):
     Run automatic setup before saving a Blender file.
     """
     # Beware: self is None
-    # Remove all caches and tmp objects, clean up to prevent stale caches
-    geometry.utils.rm_geometric_caches()
+    # Remove tmp objects, geometric caches are not saved
     geometry.utils.rm_tmp_objects()
     # Set file format version
     for sc in bpy.data.scenes:
@@ -144,20 +144,35 @@ def _save_pre(self):
 @persistent
 def _depsgraph_update_post(scene):
     """!
-    Detect object change and erase cached geometry.
+    Detect object geometry change and erase its mesh hash.
+    Transform changes are detected by the cache fingerprints.
+    Then refresh the stored voxelization estimate of the active object.
     """
-    for update in bpy.context.view_layer.depsgraph.updates:
+    context = bpy.context
+    for update in context.view_layer.depsgraph.updates:
         ob = update.id.original
+        if isinstance(ob, Scene):  # eg. default voxel size
+            geometry.to_fds.rm_voxels_estimate()
+        if not isinstance(ob, Object):
+            continue
+        geometry.to_fds.rm_voxels_estimate(ob)
         if (
-            isinstance(ob, Object)
-            and ob.type in {"MESH", "CURVE", "SURFACE", "FONT", "META"}
-            and (update.is_updated_geometry or update.is_updated_transform)
+            ob.type in {"MESH", "CURVE", "SURFACE", "FONT", "META"}
+            and update.is_updated_geometry
         ):
-            log.debug(f"Remove <{ob.name}> caches")
-            ob["ob_to_geom_cache"] = None  # TODO remove
-            ob["ob_to_xbs_cache"] = None
-            ob["ob_to_xyzs_cache"] = None  # TODO remove
-            ob["ob_to_pbs_cache"] = None  # TODO remove
+            log.debug(f"Remove <{ob.name}> mesh hash")
+            geometry.cache.rm_mesh_hash(ob)
+    # Calc in the handler, the panel only reads the stored estimate
+    ob = context.active_object
+    if (
+        ob
+        and ob.mode != "EDIT"  # no caching while editing
+        and ob.bf_xb_export
+        and ob.bf_xb == "VOXELS"
+        and not ob.bf_xb_snap_to_mesh
+        and geometry.to_fds.get_stored_voxels_estimate(ob) is None
+    ):
+        geometry.to_fds.update_voxels_estimate(context, ob)
 
 
 # Register
@@ -9,11 +9,11 @@ import bpy, logging
 import webbrowser
 import urllib3
 from bpy.types import Operator
-from bpy.props import StringProperty, BoolProperty, FloatProperty
+from bpy.props import StringProperty, BoolProperty, FloatProperty, IntProperty
 from bpy_extras.io_utils import ImportHelper, ExportHelper
 
 from .. import utils
-from ..types import BFException, FDSCase
+from ..types import BFException, FDSCase, iter_fds_namelists
 
 
 log = logging.getLogger(__name__)
@@ -50,6 +50,13 @@ class ImportFDS(Operator, ImportHelper):
     filename_ext = ".fds"
     filter_glob: StringProperty(default="*.fds", options={"HIDDEN"})
     new_scene: BoolProperty(name="Into New Scene", default=True)
+    processes: IntProperty(
+        name="Processes",
+        description="Number of processes parsing the file, one for streaming import (Linux only)",
+        default=1,
+        min=1,
+        max=64,
+    )
 
     @classmethod
     def poll(cls, context):
@@ -74,31 +81,72 @@ class ImportFDS(Operator, ImportHelper):
         # Init
         w = context.window_manager.windows[0]
         w.cursor_modal_set("WAIT")
-        # Read and parse
-        fds_case = FDSCase()
+        # Read, parse and import, one namelist at a time.
+        # On error, the new Scene is removed, while the current Scene keeps
+        # the namelists imported before the error (undo reverts them)
+        wm = context.window_manager
+        sc = None
         try:
-            fds_case.from_fds(utils.read_from_file(self.filepath))
+            with utils.map_file(self.filepath) as f:
+                # Current or new Scene, once the file is open
+                if self.new_scene:
+                    sc = bpy.data.scenes.new("Imported")
+                else:
+                    sc = context.scene
+                if self.processes > 1:  # parallel parsing
+                    fds_case = FDSCase()
+                    fds_case.from_fds(f, processes=self.processes)
+                    sc.from_fds(context, fds_case=fds_case)
+                else:  # streaming
+                    wm.progress_begin(0, max(len(f), 1))
+                    try:
+                        sc.from_fds(
+                            context, fds_namelists=self._iter_fds_namelists(wm, f)
+                        )
+                    finally:
+                        wm.progress_end()
         except Exception as err:
             w.cursor_modal_restore()
-            self.report({"ERROR"}, f"Read or parse error: {str(err)}")
-            return {"CANCELLED"}
-        # Current or new Scene
-        if self.new_scene:
-            sc = bpy.data.scenes.new("Imported")
-        else:
-            sc = context.scene
-        # Import
-        try:
-            sc.from_fds(context, fds_case=fds_case)
-        except BFException as err:
-            w.cursor_modal_restore()
-            self.report({"ERROR"}, f"Import error: {str(err)}")
+            if isinstance(err, BFException):
+                msg = f"Import error: {str(err)}"
+            elif isinstance(err, IOError):
+                msg = f"Read error: {str(err)}"
+            else:
+                msg = f"Read or parse error: {str(err)}"
+            if sc is not None:
+                if self.new_scene:
+                    self._rm_scene(sc)
+                else:
+                    msg += " (current Scene partially imported)"
+            self.report({"ERROR"}, msg)
             return {"CANCELLED"}
         # Close
         w.cursor_modal_restore()
         self.report({"INFO"}, "FDS case imported")
         return {"FINISHED"}
 
+    def _rm_scene(self, sc):
+        """!
+        Remove a partially imported Scene, and its Objects.
+        @param sc: the Blender scene.
+        """
+        for ob in list(sc.objects):
+            if len(ob.users_scene) == 1:  # only in this Scene
+                bpy.data.objects.remove(ob, do_unlink=True)
+        bpy.data.scenes.remove(sc, do_unlink=True)
+
+    def _iter_fds_namelists(self, wm, f):
+        """!
+        Yield the FDS namelists from the mapped file, and update the progress.
+        @param wm: the window manager.
+        @param f: the mapped file.
+        @return generator of FDSNamelist instances.
+        """
+        for fds_namelist in iter_fds_namelists(f):  # parsed and checked
+            yield fds_namelist
+            if f:  # empty files are not mapped
+                wm.progress_update(f.tell())
+
 
 def menu_func_import_FDS(self, context):
     """!
@@ -146,6 +194,13 @@ class ExportFDS(Operator, ExportHelper):
 
     # Export all scenes
     all_scenes: BoolProperty(name="All Scenes", default=False)
+    processes: IntProperty(
+        name="Processes",
+        description="Number of processes calculating the geometry of objects (Linux only)",
+        default=1,
+        min=1,
+        max=64,
+    )
 
     @classmethod
     def poll(cls, context):
@@ -157,7 +212,10 @@ class ExportFDS(Operator, ExportHelper):
         log.debug(f"Exporting Blender Scene <{sc.name}>")
         w.cursor_modal_set("WAIT")
         try:
-            utils.write_to_file(filepath, sc.to_fds(context=context, full=True))
+            with utils.open_to_write(filepath) as f:
+                sc.to_fds_stream(
+                    context=context, fh=f, full=True, processes=self.processes
+                )
         except BFException as err:
             self.report({"ERROR"}, f"Error assembling FDS file:\n<{str(err)}>")
             return {"CANCELLED"}
@@ -280,7 +338,7 @@ class ExportFDSCloudHPC(Operator):
                 with open(self.cloudKeyFilePath, "w") as f:
                     f.write(self.cloudHPC_key)
 
-                temp.writelines(context.scene.to_fds(context=context, full=True))
+                context.scene.to_fds_stream(context=context, fh=temp, full=True)
                 temp.seek(0)
                 self._upload_fds(self.cloudHPC_key, self.cloudHPC_dirname, self.cloudHPC_filename, temp)
                 ShowMessageBox(message="File was uploaded succesfully", title="CFD Fea Service")
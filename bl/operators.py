@@ -180,6 +180,36 @@ class SCENE_OT_bf_check_sanity(Operator):
             w.cursor_modal_restore()
 
 
+@subscribe
+class OBJECT_OT_bf_voxels_estimate(Operator):
+    """!
+    Estimate the cost of the active object voxelization.
+    """
+
+    bl_label = "Estimate Voxels"
+    bl_idname = "object.bf_voxels_estimate"
+    bl_description = "Estimate the cost of the active object voxelization"
+
+    @classmethod
+    def poll(cls, context):
+        """!
+        Test if the operator can be called or not.
+        @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+        @return True if operator can be called, False otherwise.
+        """
+        return context.active_object
+
+    def execute(self, context):
+        w = context.window_manager.windows[0]
+        w.cursor_modal_set("WAIT")
+        ob = context.active_object
+        try:
+            geometry.to_fds.update_voxels_estimate(context, ob)
+        finally:
+            w.cursor_modal_restore()
+        return {"FINISHED"}
+
+
 # Show FDS code
 
 
@@ -761,7 +791,7 @@ def _get_namelist_items(self, context, label) -> "items":
     # Get namelists from Free Text
     if sc.bf_config_text:
         f90_namelists = sc.bf_config_text.as_string()
-        fds_case.from_fds(f90_namelists, reset=False)
+        fds_case.from_fds(f90_namelists, reset=False, lazy=True)
     # Get namelists from available CATF files
     if sc.bf_catf_export:
         for filepath in tuple(item.name for item in sc.bf_catf_files if item.bf_export):
@@ -770,7 +800,7 @@ def _get_namelist_items(self, context, label) -> "items":
             except IOError:
                 pass
             else:
-                fds_case.from_fds(f90_namelists, reset=False)
+                fds_case.from_fds(f90_namelists, reset=False, lazy=True)
     # Prepare list of IDs
     items = list()
     for n in fds_case.get_fds_namelists_by_label(label):
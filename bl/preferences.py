@@ -14,6 +14,8 @@ from bpy.props import (
     EnumProperty,
 )
 
+from .. import geometry
+
 log = logging.getLogger(__name__)
 
 # Get preference value like this:
@@ -78,6 +80,100 @@ class BFPreferences(AddonPreferences):
         unit="AREA",
     )
 
+    def update_cache_size(self, context):
+        """!
+        Update the memory budget of the geometric cache.
+        @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+        """
+        geometry.cache.set_max_size(self.cache_size)
+
+    cache_size: IntProperty(
+        name="Geometry Cache Size (MB)",
+        description="Memory budget of the cache of exported geometries,\nleast recently used geometries are removed first",
+        default=256,
+        min=0,
+        update=update_cache_size,
+    )
+
+    def update_cache_directory(self, context):
+        """!
+        Update the directory of the on-disk geometric cache.
+        @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+        """
+        geometry.cache.set_disk_directory(self.cache_directory)
+
+    cache_directory: StringProperty(
+        name="Geometry Cache Directory",
+        description="Directory of the on-disk cache of voxelized and GEOM geometries,\nshared across sessions and machines (relative to the Blender file if starting with //),\nempty to disable",
+        subtype="DIR_PATH",
+        default="",
+        update=update_cache_directory,
+    )
+
+    def update_voxel_processes(self, context):
+        """!
+        Update the number of processes voxelizing large objects.
+        @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+        """
+        geometry.calc_voxels.set_processes(self.voxel_processes)
+
+    voxel_processes: IntProperty(
+        name="Voxelization Processes",
+        description="Number of processes voxelizing the tiles of large objects,\none for serial voxelization",
+        default=1,
+        min=1,
+        max=64,
+        update=update_voxel_processes,
+    )
+
+    def update_voxel_budget(self, context):
+        """!
+        Update the budget of voxelizations.
+        @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+        """
+        geometry.calc_voxels.set_max_voxels(self.voxel_budget * 1000000)
+        geometry.to_fds.rm_voxels_estimate()  # checked against the old budget
+
+    voxel_budget: IntProperty(
+        name="Voxelization Budget (M voxels)",
+        description="Max voxel grid size of a voxelization, in millions of voxels,\nlarger voxelizations are refused before running, zero for no limit",
+        default=100,
+        min=0,
+        update=update_voxel_budget,
+    )
+
+    def update_voxel_memory_budget(self, context):
+        """!
+        Update the memory budget of voxelizations.
+        @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+        """
+        geometry.calc_voxels.set_max_memory(self.voxel_memory_budget)
+        geometry.to_fds.rm_voxels_estimate()  # checked against the old budget
+
+    voxel_memory_budget: IntProperty(
+        name="Voxelization Memory Budget (MB)",
+        description="Max estimated memory of a voxelization, in MB,\nlarger voxelizations are refused before running, zero for no limit",
+        default=4096,
+        min=0,
+        update=update_voxel_memory_budget,
+    )
+
+    def update_voxel_time_budget(self, context):
+        """!
+        Update the runtime budget of voxelizations.
+        @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+        """
+        geometry.calc_voxels.set_max_runtime(self.voxel_time_budget)
+        geometry.to_fds.rm_voxels_estimate()  # checked against the old budget
+
+    voxel_time_budget: IntProperty(
+        name="Voxelization Time Budget (s)",
+        description="Max estimated runtime of a voxelization, in seconds,\nlonger voxelizations are refused before running, zero for no limit",
+        default=600,
+        min=0,
+        update=update_voxel_time_budget,
+    )
+
     def draw(self, context):
         """!
         Draw UI elements into the panel UI layout.
@@ -98,6 +194,14 @@ class BFPreferences(AddonPreferences):
         box.label(text="Default Sizes and Thresholds")
         box.prop(self, "min_edge_length")
         box.prop(self, "min_face_area")
+        box = layout.box()
+        box.label(text="Performance")
+        box.prop(self, "cache_size")
+        box.prop(self, "cache_directory")
+        box.prop(self, "voxel_processes")
+        box.prop(self, "voxel_budget")
+        box.prop(self, "voxel_memory_budget")
+        box.prop(self, "voxel_time_budget")
         return layout
 
 
@@ -109,6 +213,13 @@ def register():
     Load the Python classes and functions to blender.
     """
     bpy.utils.register_class(BFPreferences)
+    prefs = bpy.context.preferences.addons[__package__.split(".")[0]].preferences
+    geometry.cache.set_max_size(prefs.cache_size)
+    geometry.cache.set_disk_directory(prefs.cache_directory)
+    geometry.calc_voxels.set_processes(prefs.voxel_processes)
+    geometry.calc_voxels.set_max_voxels(prefs.voxel_budget * 1000000)
+    geometry.calc_voxels.set_max_memory(prefs.voxel_memory_budget)
+    geometry.calc_voxels.set_max_runtime(prefs.voxel_time_budget)
 
 
 def unregister():
@@ -0,0 +1,324 @@
+"""!
+BlenderFDS, in-memory cache of geometric results, with LRU eviction.
+"""
+
+import os, sys, hashlib, zipfile, logging
+from array import array
+from collections import OrderedDict
+
+import bpy
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# The cache lives in this process only and is never saved in the Blender file,
+# so cached results are returned as they are, without any conversion.
+# Entries are keyed by (object pointer, kind), eg. (140223, "xbs"),
+# and hold (fingerprint, result, size in bytes).
+# An entry is a hit only if its fingerprint matches the requested one:
+# fingerprints contain the mesh content hash and only the inputs that
+# affect each result, so results survive updates that do not change them.
+
+_entries = OrderedDict()  # least recently used first
+_size = 0  # current size in bytes
+_max_size = 256 * 1024 * 1024  # memory budget in bytes
+
+# The content hash of each evaluated mesh is calculated once and kept until
+# a geometry update is received from the depsgraph (see handlers).
+# Transform updates do not change it. As edits by scripts may be exported
+# before any depsgraph update, the hash is also checked against a cheap stamp
+# of the original mesh data, with a checksum of its vertices and loops.
+
+_mesh_hashes = dict()  # object pointer: (stamp, content hash)
+
+
+def set_max_size(max_size_mb):
+    """!
+    Set the memory budget of the cache, and evict entries exceeding it.
+    @param max_size_mb: the memory budget in MB.
+    """
+    global _max_size
+    _max_size = int(max_size_mb * 1024 * 1024)
+    _evict()
+
+
+def get(ob, kind, fingerprint):
+    """!
+    Get a cached result.
+    @param ob: the Blender object.
+    @param kind: the kind of result, eg. "xbs", "geom".
+    @param fingerprint: the hashable state the result depends on.
+    @return the cached result, or None if missing or stale.
+    """
+    key = ob.as_pointer(), kind
+    entry = _entries.get(key)
+    if entry is None or entry[0] != fingerprint:
+        return None
+    _entries.move_to_end(key)
+    return entry[1]
+
+
+def put(ob, kind, fingerprint, result):
+    """!
+    Set a cached result, evicting the least recently used entries if over budget.
+    @param ob: the Blender object.
+    @param kind: the kind of result, eg. "xbs", "geom".
+    @param fingerprint: the hashable state the result depends on.
+    @param result: the result, never modified afterwards.
+    @return the result.
+    """
+    global _size
+    key = ob.as_pointer(), kind
+    _pop(key)
+    size = _get_sizeof(result)
+    if size <= _max_size:
+        _entries[key] = fingerprint, result, size
+        _size += size
+        _evict()
+    return result
+
+
+def rm(ob, kind=None):
+    """!
+    Remove the cached results of an object.
+    @param ob: the Blender object.
+    @param kind: the kind of result to remove, or None for all of them.
+    """
+    pointer = ob.as_pointer()
+    if kind is not None:
+        _pop((pointer, kind))
+        return
+    for key in [k for k in _entries if k[0] == pointer]:
+        _pop(key)
+
+
+def rm_all():
+    """!
+    Remove all cached results and mesh hashes.
+    """
+    global _size
+    _entries.clear()
+    _mesh_hashes.clear()
+    _size = 0
+
+
+# Mesh content hash
+
+
+def get_mesh_hash(context, ob) -> "str or None":
+    """!
+    Get the content hash of the evaluated object mesh (eg. modifiers applied), in local coordinates.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @return the hash hex digest, or None if the object has no mesh.
+    """
+    pointer, stamp = ob.as_pointer(), _get_mesh_stamp(ob)
+    entry = _mesh_hashes.get(pointer)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    mesh_hash = _calc_mesh_hash(context, ob)
+    if stamp is not None:
+        _mesh_hashes[pointer] = stamp, mesh_hash
+    return mesh_hash
+
+
+def rm_mesh_hash(ob):
+    """!
+    Remove the content hash of the object mesh, after a geometry update.
+    @param ob: the Blender object.
+    """
+    _mesh_hashes.pop(ob.as_pointer(), None)
+
+
+def _get_mesh_stamp(ob) -> "tuple or None":
+    """!
+    Get a cheap stamp of the object data, that changes with its mesh edits.
+    @param ob: the Blender object.
+    @return the stamp, or None if the hash cannot be kept, eg. in edit mode.
+    """
+    data = ob.data
+    if data is None:
+        return ()
+    if ob.type != "MESH":
+        return (data.as_pointer(),)
+    if data.is_editmode:  # edit mesh not synced to mesh data
+        return None
+    # Checksum of the original mesh, much cheaper than evaluating it
+    h = hashlib.blake2b(digest_size=16)
+    for items, attr, dtype, size in (
+        (data.vertices, "co", np.float32, 3),
+        (data.loops, "vertex_index", np.int32, 1),
+    ):
+        values = np.empty(len(items) * size, dtype=dtype)
+        items.foreach_get(attr, values)
+        h.update(len(values).to_bytes(8, "little"))
+        h.update(values.tobytes())
+    return (
+        data.as_pointer(),
+        len(data.edges),
+        len(data.polygons),
+        h.digest(),
+        tuple((m.type, m.show_viewport) for m in ob.modifiers),
+    )
+
+
+def _calc_mesh_hash(context, ob) -> "str or None":
+    """!
+    Calc the content hash of the evaluated object mesh.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @return the hash hex digest, or None if the object has no mesh.
+    """
+    ob_eval = ob.evaluated_get(context.evaluated_depsgraph_get())
+    try:
+        me = ob_eval.to_mesh()
+    except RuntimeError:  # not convertible to mesh
+        return None
+    if me is None:
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        for items, attr, dtype, size in (
+            (me.vertices, "co", np.float32, 3),
+            (me.edges, "vertices", np.int32, 2),
+            (me.loops, "vertex_index", np.int32, 1),
+            (me.polygons, "loop_total", np.int32, 1),
+            (me.polygons, "material_index", np.int32, 1),
+        ):
+            data = np.empty(len(items) * size, dtype=dtype)
+            items.foreach_get(attr, data)
+            h.update(len(data).to_bytes(8, "little"))
+            h.update(data.tobytes())
+    finally:
+        ob_eval.to_mesh_clear()
+    return h.hexdigest()
+
+
+def _pop(key):
+    """!
+    Remove an entry, if present.
+    @param key: the entry key.
+    """
+    global _size
+    entry = _entries.pop(key, None)
+    if entry is not None:
+        _size -= entry[2]
+
+
+def _evict():
+    """!
+    Evict the least recently used entries, until the cache is within budget.
+    """
+    global _size
+    while _size > _max_size and _entries:
+        key, (_, _, size) = _entries.popitem(last=False)
+        _size -= size
+        log.debug(f"Evict cache entry <{key[1]}>")
+
+
+_sample_size = 8  # number of sampled items of long tuples and lists
+
+
+def _get_sizeof(value) -> "int":
+    """!
+    Return the estimated memory size of a result, in bytes.
+    Long tuples and lists are estimated from a sample of their items.
+    @param value: the result, nested tuples and lists of numbers, strings and arrays.
+    @return the size in bytes.
+    """
+    if isinstance(value, np.ndarray):  # views keep their base alive
+        base = value.base
+        return isinstance(base, np.ndarray) and base.nbytes or value.nbytes
+    if isinstance(value, array):
+        return len(value) * value.itemsize
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)) and value:
+        n = len(value)
+        if n <= _sample_size:
+            size += sum(map(_get_sizeof, value))
+        else:
+            sample = value[:: n // _sample_size][:_sample_size]
+            size += sum(map(_get_sizeof, sample)) * n // _sample_size
+    return size
+
+
+# On-disk cache
+
+# Expensive results (eg. voxels, GEOM) are also saved to a directory, that can be
+# shared across sessions and machines. Entries are content addressed: the file name
+# is the hash of the result kind and its fingerprint without the object name,
+# and the file holds numpy arrays (.npz), loaded without pickle.
+# Each kind has a format and algorithm version in the hashed key:
+# bump it when its results change for the same input, eg. a change in
+# calc_voxels for "xbs", or in the GEOM assembly or checks for "geom".
+
+_disk_directory = None  # None to disable
+
+_disk_versions = {"xbs": 3, "geom": 2}  # kind: version
+
+
+def set_disk_directory(path):
+    """!
+    Set the on-disk cache directory.
+    @param path: the directory path, relative to the Blender file if starting with //, empty to disable.
+    """
+    global _disk_directory
+    _disk_directory = path or None
+
+
+def load(kind, key) -> "dict or None":
+    """!
+    Load a result from the on-disk cache.
+    @param kind: the kind of result, eg. "xbs", "geom".
+    @param key: the fingerprint without the object name, starting with the mesh hash.
+    @return the dict of saved numpy arrays, or None if missing.
+    """
+    filepath = _get_disk_filepath(kind, key)
+    if not filepath or not os.path.isfile(filepath):
+        return None
+    try:
+        with np.load(filepath, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as err:
+        log.warning(f"Unreadable disk cache entry <{filepath}>: {err}")
+
+
+def save(kind, key, **arrays):
+    """!
+    Save a result to the on-disk cache, atomically.
+    @param kind: the kind of result, eg. "xbs", "geom".
+    @param key: the fingerprint without the object name, starting with the mesh hash.
+    @param arrays: the result as numpy arrays, or values convertible to them.
+    """
+    filepath = _get_disk_filepath(kind, key)
+    if not filepath:
+        return
+    tmp_filepath = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(tmp_filepath, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_filepath, filepath)  # concurrent writers save the same data
+    except OSError as err:
+        log.warning(f"Unwritable disk cache entry <{filepath}>: {err}")
+        try:
+            os.remove(tmp_filepath)
+        except OSError:
+            pass
+
+
+def _get_disk_filepath(kind, key) -> "str or None":
+    """!
+    Get the on-disk cache entry filepath.
+    @param kind: the kind of result, eg. "xbs", "geom".
+    @param key: the fingerprint without the object name, starting with the mesh hash.
+    @return the filepath, or None if the disk cache is disabled or there is no mesh.
+    """
+    if not _disk_directory or key[0] is None:
+        return None
+    version = _disk_versions[kind]
+    digest = hashlib.blake2b(
+        repr((kind, version, key)).encode(), digest_size=20
+    ).hexdigest()
+    path = bpy.path.abspath(_disk_directory)
+    return os.path.join(path, digest[:2], f"{digest}.npz")
@@ -7,6 +7,8 @@ from math import floor, ceil
 
 import bpy, bmesh, mathutils, logging
 
+import numpy as np
+
 from ..types import BFException
 from . import utils
 
@@ -25,6 +27,23 @@ def get_fds_trisurface(context, ob, scale_length, check=True, world=True):
     @param world: True to return the object in world coordinates.
     @return FDS GEOM notation as lists.
     """
+    return calc_fds_trisurface(
+        *get_trisurface_arrays(context, ob, scale_length, check, world)
+    )
+
+
+def get_trisurface_arrays(
+    context, ob, scale_length, check=True, world=True
+) -> "fds_surfids, verts, tris, material_indices":
+    """!
+    Get triangulated surface arrays from object, checked.
+    @param context: the Blender context.
+    @param ob: the Blender object.
+    @param scale_length: the scale to use.
+    @param check: True to check the bmesh sanity.
+    @param world: True to return the object in world coordinates.
+    @return the referenced surf_id, the vertices, triangles and material indices arrays.
+    """
     # Get list of referenced surf_id
     fds_surfids = list()
     for s in ob.material_slots:
@@ -36,30 +55,44 @@ def get_fds_trisurface(context, ob, scale_length, check=True, world=True):
         fds_surfids.append(ma.name)
     if not fds_surfids:
         raise BFException(ob, "No referenced SURF")
-    # Get bmesh and check it, if requested
-    bm = utils.get_object_bmesh(
-        context=context, ob=ob, world=world, triangulate=True, lookup=False
-    )
-    if check:
-        _check_bm_sanity(context, ob, bm, protect=True)
-    # Get geometric data from bmesh
-    fds_verts, fds_faces, fds_surfs = list(), list(), list()
-    fds_volus, fds_faces_surfs = list(), list()
-    for v in bm.verts:
-        co = v.co
-        fds_verts.extend(
-            (co.x * scale_length, co.y * scale_length, co.z * scale_length)
+    # Get geometric data from evaluated mesh arrays,
+    # and check the exported triangles sanity, if requested
+    with utils.get_evaluated_mesh(context, ob) as me:
+        verts = utils.get_verts_array(
+            me, matrix=ob.matrix_world if world else None, scale_length=scale_length
         )
-    for f in bm.faces:
-        v = f.verts
-        fds_faces.extend((v[0].index + 1, v[1].index + 1, v[2].index + 1))
-        fds_surfs.append(f.material_index + 1)  # FDS index start from 1, not 0
-        fds_faces_surfs.extend(  # this is for GEOM ASCII notation
-            (v[0].index + 1, v[1].index + 1, v[2].index + 1, f.material_index + 1)
-        )
-    bm.free()  # clean up bmesh
-    if not fds_verts or not fds_faces:
+        tris, material_indices = utils.get_triangles_arrays(me)
+        if check:
+            bm = bmesh.new()
+            try:
+                bm.from_mesh(me)
+                if world:
+                    bm.transform(ob.matrix_world)
+                _check_bm_sanity(context, ob, bm, protect=True, degenerate=False)
+            finally:
+                bm.free()  # clean up bmesh
+            _check_tris_sanity(context, ob, verts / scale_length, tris)
+    if not len(verts) or not len(tris):
         raise BFException(ob, "The object is empty")
+    return fds_surfids, verts, tris, material_indices
+
+
+def calc_fds_trisurface(fds_surfids, verts, tris, material_indices):
+    """!
+    Transform triangulated surface arrays to FDS format.
+    @param fds_surfids: the referenced surf_id.
+    @param verts: the vertices coordinates, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param material_indices: the triangles material indices.
+    @return FDS GEOM notation as lists.
+    """
+    tris = tris + 1  # FDS index start from 1, not 0
+    material_indices = material_indices + 1
+    fds_verts = verts.ravel().tolist()
+    fds_faces = tris.ravel().tolist()
+    fds_surfs = material_indices.tolist()
+    fds_volus = list()
+    fds_faces_surfs = np.column_stack((tris, material_indices)).ravel().tolist()
     return fds_surfids, fds_verts, fds_faces, fds_surfs, fds_volus, fds_faces_surfs
 
 
@@ -80,7 +113,7 @@ def check_geom_sanity(context, ob, protect):
     bm.free()
 
 
-def _get_epsilons(context):
+def get_epsilons(context):
     """!
     Get epsilons for geometry sanity checks.
     @param context: the Blender context.
@@ -98,19 +131,21 @@ def _get_epsilons(context):
     )  # min_edge_length, min_face_area
 
 
-def _check_bm_sanity(context, ob, bm, protect):
+def _check_bm_sanity(context, ob, bm, protect, degenerate=True):
     """!
     Check that bmesh is a closed orientable manifold, with no degenerate geometry.
     @param context: the Blender context.
     @param ob: the Blender object.
     @param bm: the object's bmesh.
     @param protect: if True raise BFException without context modifications.
+    @param degenerate: if False skip the degenerate edges and faces checks.
     """
-    epsilon_len, epsilon_area = _get_epsilons(context)
+    epsilon_len, epsilon_area = get_epsilons(context)
     _check_bm_manifold_verts(context, ob, bm, epsilon_len, epsilon_area, protect)
     _check_bm_manifold_edges(context, ob, bm, epsilon_len, epsilon_area, protect)
-    _check_bm_degenerate_edges(context, ob, bm, epsilon_len, epsilon_area, protect)
-    _check_bm_degenerate_faces(context, ob, bm, epsilon_len, epsilon_area, protect)
+    if degenerate:
+        _check_bm_degenerate_edges(context, ob, bm, epsilon_len, epsilon_area, protect)
+        _check_bm_degenerate_faces(context, ob, bm, epsilon_len, epsilon_area, protect)
     _check_bm_loose_vertices(context, ob, bm, epsilon_len, epsilon_area, protect)
     _check_bm_duplicate_vertices(context, ob, bm, epsilon_len, epsilon_area, protect)
     _check_bm_normals(context, ob, bm, epsilon_len, epsilon_area, protect)
@@ -262,6 +297,30 @@ def _check_bm_duplicate_vertices(context, ob, bm, epsilon_len, epsilon_area, pro
         _raise_bad_geometry(context, ob, bm, msg, protect, bad_verts=bad_verts)
 
 
+def _check_tris_sanity(context, ob, verts, tris):
+    """!
+    Check no degenerate edges and faces in the triangles arrays.
+    @param context: the Blender context.
+    @param ob: the Blender object.
+    @param verts: the vertices coordinates as float array of shape (n, 3).
+    @param tris: the triangles vertex indices as int array of shape (n, 3).
+    """
+    epsilon_len, epsilon_area = get_epsilons(context)
+    # Too short edges, each counted once
+    edges = np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edges = np.unique(edges, axis=0)
+    lengths = np.linalg.norm(verts[edges[:, 1]] - verts[edges[:, 0]], axis=1)
+    nbad = np.count_nonzero(lengths <= epsilon_len)
+    if nbad:
+        raise BFException(ob, f"Too short edges detected ({nbad} edges).")
+    # Too small area faces
+    v0, v1, v2 = verts[tris[:, 0]], verts[tris[:, 1]], verts[tris[:, 2]]
+    areas = np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1) / 2.0
+    nbad = np.count_nonzero(areas <= epsilon_area)
+    if nbad:
+        raise BFException(ob, f"Too small area faces detected ({nbad} faces).")
+
+
 # Check intersections
 
 
@@ -2,13 +2,13 @@
 BlenderFDS, voxelization algorithms.
 """
 
-import bpy, bmesh, logging
-from math import floor, ceil
+import bpy, logging
 
-from mathutils import Matrix
+import numpy as np
 
 from ..types import BFException
-from . import utils
+from ..utils import get_process_pool
+from . import utils, cache
 
 log = logging.getLogger(__name__)
 
@@ -17,142 +17,233 @@ log = logging.getLogger(__name__)
 # one and only origin of axes)
 
 
-def get_voxels(context, ob, scale_length):
+def get_voxels(context, ob, scale_length, incremental=True):
     """!
     Get voxels from object in xbs format.
     @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
     @param ob: the Blender object.
     @param scale_length: the scale to use.
+    @param incremental: if True, update the last voxelization of the object being edited, when possible.
     @return the voxels in xbs format.
     """
     log.debug(ob.name)
-    # Check object and init
-    if ob.type not in {"MESH", "CURVE", "SURFACE", "FONT", "META"}:
-        raise BFException(ob, "Object can not be converted to mesh.")
-    if not ob.data.vertices:
+    voxel_size = get_voxel_size(context, ob)
+    # Get evaluated mesh (eg. modifiers applied) triangles, in world coo
+    with utils.get_evaluated_mesh(context, ob) as me:
+        verts = utils.get_verts_array(me, matrix=ob.matrix_world)
+        tris, _ = utils.get_triangles_arrays(me)
+    if not len(tris):
         raise BFException(ob, "Empty object!")
-    voxel_size = _get_voxel_size(context, ob)
-    # Get evaluated ob (eg. modifiers applied) and its Mesh
-    dg = context.evaluated_depsgraph_get()
-    ob_eval = ob.evaluated_get(dg)  # no need to clean up, it is tmp
-    me_eval = bpy.data.meshes.new_from_object(ob_eval)  # static
-    # Create a new Object, in world coo
-    ob_tmp = bpy.data.objects.new(f"{ob.name}_voxels_tmp", me_eval)
-    ob_tmp.data.transform(ob.matrix_world)
-    context.collection.objects.link(ob_tmp)
-    # Align voxels to world origin and add remesh modifier
-    _align_remesh_bbox(context, ob_tmp, voxel_size, centered=ob.bf_xb_center_voxels)
-    _add_remesh_mod(context, ob_tmp, voxel_size)
-    # Get evaluated bmesh from ob_tmp; it is already in world coo
-    bm = utils.get_object_bmesh(context, ob_tmp, world=False)
-    # Clean up
-    bpy.data.meshes.remove(ob_tmp.data, do_unlink=True)  # no mem leaks
-    # Check
-    if len(bm.faces) == 0:  # no faces
-        raise BFException(ob, "No voxel created!")
-    # Get faces and sort them according to normals
-    x_faces, y_faces, z_faces = _sort_faces_by_normal(bm)
-    # Choose shorter list of faces, relative functions, and parameters
-    choices = [
-        (len(x_faces), _get_boxes_along_x, x_faces, _grow_boxes_along_x, 0),
-        (len(y_faces), _get_boxes_along_y, y_faces, _grow_boxes_along_y, 2),
-        (len(z_faces), _get_boxes_along_z, z_faces, _grow_boxes_along_z, 4),
-    ]
-    choices.sort(key=lambda choice: choice[0])
-    get_boxes = choices[0][1]  # get boxes by fastest orientation
-    faces = choices[0][2]
-    grow_boxes_along_first_axis = choices[1][3]  # 1st axis growing direction
-    first_sort_by = choices[2][4]
-    grow_boxes_along_second_axis = choices[2][3]  # 2nd axis growing direction
-    second_sort_by = choices[1][4]
-    # For each face find other sides and build boxes data structure
-    boxes, origin = get_boxes(faces, voxel_size)
-    # Join boxes along other axis and return their world coordinates
-    boxes = grow_boxes_along_first_axis(boxes, first_sort_by)
-    boxes = grow_boxes_along_second_axis(boxes, second_sort_by)
-    # Transform boxes to xbs in world coordinates and correct for unit_settings
-    xbs = list(_get_box_xbs(boxes, origin, voxel_size, scale_length))
-    # Clean up
-    bm.free()
+    if ob.bf_xb_snap_to_mesh:
+        grids = get_mesh_grids(context)
+        xbs, voxel_size = calc_snapped_voxels(
+            verts, tris, grids, scale_length, processes=_processes
+        )
+        if voxel_size is None:
+            raise BFException(ob, "No MESH overlapping the object!")
+    elif incremental and _is_edited(context, ob):
+        xbs = _calc_voxels_incremental(
+            ob, verts, tris, voxel_size, ob.bf_xb_center_voxels, scale_length
+        )
+    else:
+        cache.rm(ob, "voxels")  # the last voxelization is kept while edited only
+        xbs = calc_voxels(
+            verts,
+            tris,
+            voxel_size,
+            ob.bf_xb_center_voxels,
+            scale_length,
+            processes=_processes,
+        )
     if not xbs:
         raise BFException(ob, "No voxel created!")
     return xbs, voxel_size * scale_length
 
 
-def _sort_faces_by_normal(bm):
+def calc_voxels(verts, tris, voxel_size, centered, scale_length, processes=1) -> "xbs":
     """!
-    Sort bmesh faces according to normal.
-    @param bm: the bmesh to handle.
-    @return the x, y and z faces lists.
+    Calc voxels from a closed triangle mesh in xbs format.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param voxel_size: the voxel size.
+    @param centered: if True align voxels to the mesh center, else to world origin.
+    @param scale_length: the scale to use.
+    @param processes: number of processes voxelizing the tiles.
+    @return the voxels in xbs format, empty if none.
     """
-    x_faces, y_faces, z_faces = list(), list(), list()
-    for face in bm.faces:
-        normal = face.normal
-        if abs(normal[0]) > 0.9:
-            x_faces.append(face)  # face is normal to x axis
-        elif abs(normal[1]) > 0.9:
-            y_faces.append(face)  # ... to y axis
-        elif abs(normal[2]) > 0.9:
-            z_faces.append(face)  # ... to z axis
-        else:
-            raise ValueError("BFDS: abnormal face")
-    if len(x_faces) < 2 or len(y_faces) < 2 or len(z_faces) < 2:
-        raise ValueError("BFDS: not enough faces")
-    return x_faces, y_faces, z_faces
-
-
-# When appling a remesh modifier to a Blender Object in BLOCKS mode,
-# the object max dimension is scaled up and divided in
-# (2 ** octree_depth voxels - 1) cubic voxels
-# Example: dimension = 4.2, voxel_size = 0.2,
-# octree_depth = 5, number of voxels = 2^5-1 = 31,
-# scale = 3/4 = 0.75
-# The next function reverses the procedures and calculate octree_depth
-# and scale that generate the desired voxel_size.
-
-
-def _init_remesh_mod(context, ob, voxel_size) -> "octree_depth, scale":
-    """!
-    Calc remesh modifier parameters from voxel_size.
-    When appling a remesh modifier to a Blender Object in BLOCKS mode,
-    the object max dimension is scaled up and divided in
-    (2 ** octree_depth voxels - 1) cubic voxels.
-    This function reverses the procedures and calculate octree_depth
-    and scale that generate the desired voxel_size.
+    origin, shape = _get_voxel_grid(verts, voxel_size, centered)
+    return _calc_grid_voxels(
+        verts, tris, origin, shape, voxel_size, scale_length, processes
+    )
+
+
+def _calc_grid_voxels(
+    verts, tris, origin, shape, voxel_size, scale_length, processes=1, surface=True
+) -> "xbs":
+    """!
+    Calc voxels from a closed triangle mesh on a voxel grid, in xbs format.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param origin: the world coordinates of the grid first corner.
+    @param shape: the number of voxels along x, y, z.
+    @param voxel_size: the voxel size, or the voxel sizes along x, y, z.
+    @param scale_length: the scale to use.
+    @param processes: number of processes voxelizing the tiles.
+    @param surface: if True the voxels touched by the surface are solid too.
+    @return the voxels in xbs format, empty if none.
+    """
+    axis, tiles = _get_tiles(shape)
+    if len(tiles) == 1:
+        occupancy = get_occupancy(
+            verts, tris, origin, shape, voxel_size, surface=surface
+        )
+        boxes = _get_boxes(occupancy)
+    else:
+        boxes = _get_tiled_boxes(
+            verts, tris, origin, voxel_size, axis, tiles, processes, surface
+        )
+    return _get_box_xbs(boxes, origin, voxel_size, scale_length)
+
+
+# Incremental voxelization
+
+# The last mesh, occupancy grid and boxes of the objects being edited are kept
+# in the cache, the active and the selected ones.
+# When only some vertices are moved on the same grid, the ray columns crossing
+# the changed triangles are rasterized again, and only the boxes touching them
+# are merged again. Local merges fragment the boxes over time, so all of them
+# are merged again when their number grows too much.
+
+_max_changed_ratio = 0.25  # max ratio of changed triangles for an update
+_max_boxes_ratio = 1.1  # max ratio of boxes to the boxes of the last full merge
+
+
+def _is_edited(context, ob) -> "bool":
+    """!
+    Check if the object is being edited.
     @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
     @param ob: the Blender object.
-    @param voxel_size: the voxel size of the object.
-    @return the octree_depth and scale that generate the desired voxel_size.
-    """
-    dimension, octree_depth = max(ob.dimensions), 0.0
-    while True:
-        octree_depth += 1.0
-        scale = dimension / voxel_size / 2 ** octree_depth
-        if 0.010 < scale < 0.990:
-            break
-        if octree_depth > 9:
-            raise BFException(
-                ob, "Object too large for its voxel size, split in parts."
+    @return True if the object is the active or a selected one.
+    """
+    return ob == context.view_layer.objects.active or ob.select_get()
+
+
+def _calc_voxels_incremental(
+    ob, verts, tris, voxel_size, centered, scale_length
+) -> "xbs":
+    """!
+    Calc voxels from a closed triangle mesh in xbs format, updating the last voxelization.
+    @param ob: the Blender object, owner of the last voxelization.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param voxel_size: the voxel size.
+    @param centered: if True align voxels to the mesh center, else to world origin.
+    @param scale_length: the scale to use.
+    @return the voxels in xbs format, empty if none.
+    """
+    origin, shape = _get_voxel_grid(verts, voxel_size, centered)
+    _, tiles = _get_tiles(shape)
+    if len(tiles) > 1:  # too large to be kept
+        return _calc_grid_voxels(
+            verts, tris, origin, shape, voxel_size, scale_length, _processes
+        )
+    fingerprint = voxel_size, origin, shape
+    # state is (verts, tris, occupancy, boxes, number of boxes of the last full merge)
+    state = cache.get(ob, "voxels", fingerprint)
+    result = state and _update_voxels(state, verts, tris, origin, shape, voxel_size)
+    if result:
+        log.debug(f"Update <{ob.name}> voxels incrementally")
+        occupancy, boxes = result
+        nboxes = state[4]
+        if len(boxes) > _max_boxes_ratio * nboxes:
+            boxes = _get_boxes(occupancy)
+            nboxes = len(boxes)
+    else:
+        occupancy = get_occupancy(verts, tris, origin, shape, voxel_size).copy()
+        boxes = _get_boxes(occupancy)
+        nboxes = len(boxes)
+    # occupancy is owned, so that the cache counts its size
+    cache.put(ob, "voxels", fingerprint, (verts, tris, occupancy, boxes, nboxes))
+    return _get_box_xbs(boxes, origin, voxel_size, scale_length)
+
+
+def _update_voxels(state, verts, tris, origin, shape, voxel_size) -> "occupancy, boxes":
+    """!
+    Update the last occupancy grid and boxes to the new mesh.
+    @param state: the last (verts, tris, occupancy, boxes, ...), on the same grid.
+    @param verts: the new vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the new triangles vertex indices, array of shape (n, 3).
+    @param origin: the world coordinates of the grid first corner.
+    @param shape: the number of voxels along x, y, z.
+    @param voxel_size: the voxel size.
+    @return the new occupancy and boxes, or None if the update is not possible.
+    """
+    verts0, tris0, occupancy0, boxes0 = state[:4]
+    if verts0.shape != verts.shape or not np.array_equal(tris0, tris):
+        return  # topology changed
+    moved = np.any(verts0 != verts, axis=1)
+    changed = moved[tris].any(axis=1)
+    if not changed.any():
+        return occupancy0, boxes0
+    if np.count_nonzero(changed) > _max_changed_ratio * len(tris):
+        return  # not local
+    # Get the window of the ray columns crossing the old and new changed triangles
+    # padded by a voxel, all along the ray axis a
+    a = int(np.argmax(shape))  # as in get_occupancy()
+    co = np.concatenate((verts0[tris[changed]], verts[tris[changed]])).reshape(-1, 3)
+    co = (co - origin) / voxel_size
+    p0 = np.clip(np.floor(co.min(axis=0)).astype(int) - 1, 0, shape)
+    p1 = np.clip(np.ceil(co.max(axis=0)).astype(int) + 1, 0, shape)
+    p0[a], p1[a] = 0, shape[a]
+    # Rasterize the window, with all the triangles crossing it
+    window = tuple(slice(i0, i1) for i0, i1 in zip(p0, p1))
+    co = (verts - origin) / voxel_size
+    co_min, co_max = co[tris].min(axis=1), co[tris].max(axis=1)
+    selected = np.all((co_max >= p0 - 1) & (co_min <= p1 + 1), axis=1)
+    occupancy = occupancy0.copy()
+    occupancy[window] = get_occupancy(
+        verts,
+        tris[selected],
+        tuple((np.array(origin) + p0 * voxel_size).tolist()),
+        tuple((p1 - p0).tolist()),
+        voxel_size,
+        axis=a,
+    )
+    # Keep the boxes outside the window, and merge again the others
+    boxes = np.array(boxes0, dtype=int).reshape(-1, 6)
+    b0, b1 = boxes[:, 0::2], boxes[:, 1::2]
+    removed = np.all((b0 < p1) & (b1 > p0), axis=1)
+    r0 = np.minimum(p0, b0[removed].min(axis=0, initial=shape[0] + shape[1] + shape[2]))
+    r1 = np.maximum(p1, b1[removed].max(axis=0, initial=0))
+    region = tuple(slice(i0, i1) for i0, i1 in zip(r0, r1))
+    remaining = occupancy[region].copy()
+    for box in boxes[~removed & np.all((b0 < r1) & (b1 > r0), axis=1)]:
+        remaining[
+            tuple(
+                slice(max(box[i * 2] - r0[i], 0), max(box[i * 2 + 1] - r0[i], 0))
+                for i in range(3)
             )
-    return octree_depth, scale
+        ] = False  # already covered by kept boxes
+    new_boxes = _get_boxes(remaining)
+    for box in new_boxes:
+        for i in range(6):
+            box[i] += int(r0[i // 2])
+    return occupancy, boxes[~removed].tolist() + new_boxes
 
 
-def _add_remesh_mod(context, ob, voxel_size) -> "modifier":
+_processes = 1  # number of processes voxelizing the tiles
+
+
+def set_processes(processes):
     """!
-    Add new blocks remesh modifier.
-    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
-    @param ob: the Blender object.
-    @param voxel_size: the voxel size of the object.
-    @return the modifier.
+    Set the number of processes voxelizing the tiles of large objects.
+    @param processes: number of processes, one for serial voxelization.
     """
-    octree_depth, scale = _init_remesh_mod(context, ob, voxel_size)
-    mo = ob.modifiers.new("remesh_tmp", "REMESH")
-    mo.mode, mo.use_remove_disconnected = "BLOCKS", False
-    mo.octree_depth, mo.scale = octree_depth, scale
-    return mo
+    global _processes
+    _processes = max(int(processes), 1)
 
 
-def _get_voxel_size(context, ob) -> "voxel_size":
+def get_voxel_size(context, ob) -> "voxel_size":
     """!
     Get voxel_size of an object.
     @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
@@ -165,334 +256,885 @@ def _get_voxel_size(context, ob) -> "voxel_size":
         return context.scene.bf_default_voxel_size
 
 
-# When appling a remesh modifier to a Blender Object, the octree is aligned with
-# the max dimension of the object. By inserting some loose vertices to the
-# temporary object, we can align the voxelization to FDS world origin
+# Cost estimate
 
+# The voxelization cost is estimated before running it, without rasterizing:
+# the voxel grid covering the mesh bounding box drives memory and runtime of
+# dense grids, the mesh surface area those of run-length encoded ones and the
+# number of merged boxes, and the mesh volume and surface the number of solid voxels.
+# Constants are measured on curved solids, axis aligned solids merge in fewer boxes.
 
-def _align_remesh_bbox(context, ob, voxel_size, centered=False):
+_max_voxels = 100 * 1000000  # max voxel grid size of a voxelization, 0 for no limit
+_max_memory = 4096 * 2**20  # max memory of a voxelization in bytes, 0 for no limit
+_max_runtime = 600.0  # max runtime of a voxelization in s, 0 for no limit
+_grid_bytes = 3  # bytes per grid voxel: toggles, occupancy, and merge copy
+_face_bytes = 32  # bytes per voxel face on the surface, for run-length encoding
+_xb_bytes = 200  # bytes per xb tuple
+_voxel_time = 8e-8  # seconds per grid voxel, rasterization and merge
+_face_time = 8e-7  # seconds per voxel face on the surface, for run-length encoding
+_boxes_per_face = 0.1  # merged boxes per voxel face on the surface
+
+
+def set_max_voxels(max_voxels):
     """!
-    Modify object mesh for remesh voxel safe alignment to world origin or to ob center by inserting 8 vertices.
-    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    Set the budget of voxelizations, refused when exceeding it.
+    @param max_voxels: the max voxel grid size, 0 for no limit.
+    """
+    global _max_voxels
+    _max_voxels = max(int(max_voxels), 0)
+
+
+def set_max_memory(max_memory_mb):
+    """!
+    Set the memory budget of voxelizations, refused when exceeding it.
+    @param max_memory_mb: the max estimated memory in MB, 0 for no limit.
+    """
+    global _max_memory
+    _max_memory = max(int(max_memory_mb * 2**20), 0)
+
+
+def set_max_runtime(max_runtime):
+    """!
+    Set the runtime budget of voxelizations, refused when exceeding it.
+    @param max_runtime: the max estimated runtime in s, 0 for no limit.
+    """
+    global _max_runtime
+    _max_runtime = max(float(max_runtime), 0.0)
+
+
+def calc_voxels_estimate(
+    verts, tris, voxel_size, centered
+) -> "ngrid, nvoxels, nxbs, memory, runtime":
+    """!
+    Estimate the cost of the voxelization of a closed triangle mesh.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param voxel_size: the voxel size.
+    @param centered: if True align voxels to the mesh center, else to world origin.
+    @return the voxel grid size, the solid voxels, the xbs, the memory in bytes and the runtime in s.
+    """
+    if not len(tris):
+        return 0, 0, 0, 0, 0.0
+    _, shape = _get_voxel_grid(verts, voxel_size, centered)
+    ngrid = shape[0] * shape[1] * shape[2]
+    # Volume (divergence theorem) and surface area from the triangles
+    v0, v1, v2 = verts[tris[:, 0]], verts[tris[:, 1]], verts[tris[:, 2]]
+    volume = abs(np.einsum("ij,ij->", v0, np.cross(v1, v2))) / 6.0
+    area = float(np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1).sum()) / 2.0
+    nfaces = area / voxel_size**2
+    nvoxels = min(int(round(volume / voxel_size**3 + nfaces / 2.0)), ngrid)
+    nxbs = min(int(np.ceil(_boxes_per_face * nfaces)), nvoxels)
+    # Large grids are voxelized by tiles in run-length encoding, see _calc_grid_voxels()
+    _, tiles = _get_tiles(shape)
+    if len(tiles) > 1:
+        memory = int(_face_bytes * nfaces)
+        runtime = _face_time * nfaces / min(_processes, len(tiles))
+    else:
+        memory = ngrid * _grid_bytes
+        runtime = ngrid * _voxel_time
+    memory += nxbs * _xb_bytes
+    return ngrid, nvoxels, nxbs, memory, runtime
+
+
+def check_voxels_estimate(ob, estimate):
+    """!
+    Check the voxelization cost estimate against the budget of grid size, memory and runtime.
     @param ob: the Blender object.
-    @param voxel_size: the voxel size of the object.
-    """
-    bb = utils.get_bbox_xbs(context, ob, scale_length=1.0)  # in world coo
-    # Calc new bbox (in Blender units)
-    #           +----+ bb1, pv1
-    #           |    |
-    #  bb0, pv0 +----+  + origin
-    # Calc voxel grid origin
-    if centered:
-        hvs = voxel_size / 2.0
-        origin = (
-            (bb[1] + bb[0]) / 2.0 - hvs,
-            (bb[3] + bb[2]) / 2.0 - hvs,
-            (bb[5] + bb[4]) / 2.0 - hvs,
+    @param estimate: the cost estimate, see calc_voxels_estimate().
+    """
+    ngrid, _, _, memory, runtime = estimate
+    if (
+        (_max_voxels and ngrid > _max_voxels)
+        or (_max_memory and memory > _max_memory)
+        or (_max_runtime and runtime > _max_runtime)
+    ):
+        raise BFException(
+            ob,
+            f"Voxelization over budget ({ngrid / 1e6:.1f}M voxels, {memory / 2**20:.0f} MB, ~{runtime:.0f} s), increase the voxel size or the budget!",
         )
+
+
+# The voxel grid is aligned to world origin, or to the mesh bounding box center
+# shifted by half a voxel, and covers the mesh bounding box.
+#           +----+ pv1
+#           |    |
+#      pv0  +----+  + origin
+
+
+def _get_voxel_grid(verts, voxel_size, centered=False) -> "origin, shape":
+    """!
+    Get the voxel grid covering the mesh.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param voxel_size: the voxel size.
+    @param centered: if True align voxels to the mesh center, else to world origin.
+    @return the world coordinates of the grid first corner, the number of voxels along x, y, z.
+    """
+    bb0, bb1 = verts.min(axis=0), verts.max(axis=0)
+    if centered:
+        origin = (bb0 + bb1) / 2.0 - voxel_size / 2.0
     else:
-        origin = 0.0, 0.0, 0.0
+        origin = np.zeros(3)
     # Calc adimensional coordinates and align to the voxel grid
-    pv0 = (
-        floor((bb[0] - origin[0]) / voxel_size),
-        floor((bb[2] - origin[1]) / voxel_size),
-        floor((bb[4] - origin[2]) / voxel_size),
-    )
-    pv1 = (
-        ceil((bb[1] - origin[0]) / voxel_size),
-        ceil((bb[3] - origin[1]) / voxel_size),
-        ceil((bb[5] - origin[2]) / voxel_size),
-    )
-    # Set odd number of voxels for better shapes
-    pv1 = (
-        pv0[0] + (pv1[0] - pv0[0]) // 2 * 2 + 1,
-        pv0[1] + (pv1[1] - pv0[1]) // 2 * 2 + 1,
-        pv0[2] + (pv1[2] - pv0[2]) // 2 * 2 + 1,
-    )
-    # Calc new bounding box
-    bb = (
-        pv0[0] * voxel_size + origin[0],
-        pv1[0] * voxel_size + origin[0],
-        pv0[1] * voxel_size + origin[1],
-        pv1[1] * voxel_size + origin[1],
-        pv0[2] * voxel_size + origin[2],
-        pv1[2] * voxel_size + origin[2],
+    pv0 = np.floor((bb0 - origin) / voxel_size)
+    pv1 = np.ceil((bb1 - origin) / voxel_size)
+    origin = tuple((origin + pv0 * voxel_size).tolist())
+    return origin, tuple((pv1 - pv0).astype(int).tolist())
+
+
+# FDS snaps each OBST to the cell grid of the MESH it lands in.
+# Solids can be voxelized directly on the cell grids of the MESH objects they
+# overlap, so that the voxels are exactly the cells resolved by FDS.
+# Parts outside any MESH are ignored, as FDS does.
+# Cells touched by the surface are not added, only the cells with their center
+# inside the solid are solid, as FDS snaps the OBST faces to the nearest cell faces.
+
+
+def get_mesh_grids(context) -> "((origin, ijk, cell_sizes), ...)":
+    """!
+    Get the cell grids of the exported MESH objects.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @return the cell grids, as first corner world coordinates, number of cells and cell sizes.
+    """
+    grids = list()
+    obs = [
+        ob
+        for ob in context.scene.objects
+        if ob.bf_namelist_cls == "ON_MESH"
+        and ob.type == "MESH"
+        and not ob.hide_render
+        and not ob.bf_is_tmp
+    ]
+    obs.sort(key=lambda k: k.name)
+    for ob in obs:
+        x0, x1, y0, y1, z0, z1 = utils.get_bbox_xbs(
+            context, ob, scale_length=1.0, world=True
+        )
+        i, j, k = ob.bf_mesh_ijk
+        cell_sizes = (x1 - x0) / i, (y1 - y0) / j, (z1 - z0) / k
+        grids.append(((x0, y0, z0), (i, j, k), cell_sizes))
+    return tuple(grids)
+
+
+def calc_snapped_voxels(
+    verts, tris, grids, scale_length, processes=1
+) -> "xbs, min_cell_size":
+    """!
+    Calc voxels from a closed triangle mesh on the overlapping cell grids, in xbs format.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param grids: the cell grids, see get_mesh_grids().
+    @param scale_length: the scale to use.
+    @param processes: number of processes voxelizing the tiles.
+    @return the voxels in xbs format, and the min used cell size or None if no overlap.
+    """
+    bb0, bb1 = verts.min(axis=0), verts.max(axis=0)
+    xbs, min_cell_size = list(), None
+    for origin, ijk, cell_sizes in grids:
+        origin, cell_sizes = np.array(origin), np.array(cell_sizes)
+        # Get the window of cells overlapping the mesh bounding box
+        p0 = np.clip(np.floor((bb0 - origin) / cell_sizes), 0, ijk).astype(int)
+        p1 = np.clip(np.ceil((bb1 - origin) / cell_sizes), 0, ijk).astype(int)
+        if np.any(p1 <= p0):  # no overlap
+            continue
+        window_origin = tuple((origin + p0 * cell_sizes).tolist())
+        window_shape = tuple((p1 - p0).tolist())
+        xbs.extend(
+            _calc_grid_voxels(
+                verts,
+                tris,
+                window_origin,
+                window_shape,
+                cell_sizes,
+                scale_length,
+                processes,
+                surface=False,
+            )
+        )
+        min_cell_size = min(min_cell_size or np.inf, float(cell_sizes.min()))
+    return xbs, min_cell_size
+
+
+# The following functions rasterize a closed triangle mesh on the voxel grid,
+# by ray parity: rays are cast through the voxel centers along the longest
+# axis of the grid, so that there are fewer rays. Each triangle crossed by a ray
+# toggles the solid state of the voxels beyond the crossing point:
+# Eg.: z axis --> ray 0|==solid==|1 void 2|==solid==|3 void ...
+# Toggles are accumulated along the rays by xor, so that no sort is required.
+# Rays through triangle edges and vertices are counted once, by the top-left rule
+# on edge functions that are exactly antisymmetric for shared edges.
+# The voxels touched by the surface are then added, see _get_surface_voxels().
+
+_max_hits = 1 << 22  # max number of candidate ray hits per chunk
+
+
+def get_occupancy(
+    verts, tris, origin, shape, voxel_size, axis=None, surface=True
+) -> "array (nx, ny, nz)":
+    """!
+    Rasterize a closed triangle mesh on the voxel grid.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param origin: the world coordinates of the grid first corner.
+    @param shape: the number of voxels along x, y, z.
+    @param voxel_size: the voxel size, or the voxel sizes along x, y, z.
+    @param axis: the ray axis, or None for the longest one.
+    @param surface: if True the voxels touched by the surface are solid too.
+    @return the boolean occupancy of the voxels, True if solid.
+    """
+    # Choose the ray axis a and the ray plane axes u, v
+    a = int(np.argmax(shape)) if axis is None else axis
+    u, v = (a + 1) % 3, (a + 2) % 3
+    nu, nv, na = shape[u], shape[v], shape[a]
+    toggles = np.zeros((nu, nv, na + 1), dtype=np.uint8)
+    if nu and nv and na and len(tris):
+        # Adimensional coordinates, with voxel centers on integers
+        co = (verts - origin) / voxel_size - 0.5
+        for hits in _get_ray_hits(co[:, u], co[:, v], co[:, a], tris, nu, nv):
+            iu, iv, t = hits
+            ia = np.clip(np.floor(t).astype(np.int64) + 1, 0, na)
+            flat = (iu * nv + iv) * (na + 1) + ia
+            flat, counts = np.unique(flat, return_counts=True)
+            toggles.reshape(-1)[flat[counts & 1 == 1]] ^= 1
+    # Accumulate toggles along the rays
+    occupancy = np.bitwise_xor.accumulate(toggles[:, :, :na], axis=2).view(bool)
+    # Back to x, y, z axes
+    occupancy = np.transpose(occupancy, [(u, v, a).index(i) for i in range(3)])
+    # Add the voxels touched by the surface
+    if surface and nu and nv and na and len(tris):
+        co = (verts - origin) / voxel_size
+        for ix, iy, iz in _get_surface_voxels(co, tris, shape):
+            occupancy[ix, iy, iz] = True
+    return occupancy
+
+
+def _get_ray_hits(cu, cv, ca, tris, nu, nv) -> "iterator of (iu, iv, t)":
+    """!
+    Get the ray hits of the triangles, in chunks.
+    Rays are parallel to the a axis, and pass through integer u, v coordinates.
+    @param cu: the vertices u coordinates.
+    @param cv: the vertices v coordinates.
+    @param ca: the vertices a coordinates.
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param nu: the number of rays along u.
+    @param nv: the number of rays along v.
+    @return the iterator of ray u indices, ray v indices and hit a coordinates.
+    """
+    # Get the candidate rays of each triangle from its bounding box
+    tu, tv = cu[tris], cv[tris]
+    iu0 = np.clip(np.ceil(tu.min(axis=1)), 0, nu).astype(np.int64)
+    iu1 = np.clip(np.floor(tu.max(axis=1)) + 1, 0, nu).astype(np.int64)
+    iv0 = np.clip(np.ceil(tv.min(axis=1)), 0, nv).astype(np.int64)
+    iv1 = np.clip(np.floor(tv.max(axis=1)) + 1, 0, nv).astype(np.int64)
+    nus, nvs = np.maximum(iu1 - iu0, 0), np.maximum(iv1 - iv0, 0)
+    counts = nus * nvs
+    starts = np.cumsum(counts) - counts
+    # Send triangles in chunks, to limit memory usage
+    i0 = 0
+    while i0 < len(tris):
+        i1 = int(np.searchsorted(starts, starts[i0] + _max_hits))
+        i1 = max(i1, i0 + 1)  # at least one triangle
+        itris = np.repeat(np.arange(i0, i1), counts[i0:i1])
+        if len(itris):
+            # Index of each candidate ray in its triangle bounding box
+            irays = np.arange(len(itris)) - (starts[itris] - starts[i0])
+            iu = iu0[itris] + irays // nvs[itris]
+            iv = iv0[itris] + irays % nvs[itris]
+            yield _intersect_rays(cu, cv, ca, tris[itris], iu, iv)
+        i0 = i1
+
+
+def _intersect_rays(cu, cv, ca, tris, iu, iv) -> "iu, iv, t":
+    """!
+    Intersect rays with triangles, one ray per triangle.
+    @param cu: the vertices u coordinates.
+    @param cv: the vertices v coordinates.
+    @param ca: the vertices a coordinates.
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param iu: the ray u indices.
+    @param iv: the ray v indices.
+    @return the hitting ray u indices, ray v indices, and hit a coordinates.
+    """
+    pu, pv = iu.astype(np.float64), iv.astype(np.float64)
+    # Edge functions of edges opposite to each vertex,
+    # calculated from the lower vertex index for exact antisymmetry
+    ws, claims = list(), list()
+    for i0, i1 in ((1, 2), (2, 0), (0, 1)):
+        j0, j1 = tris[:, i0], tris[:, i1]
+        sign = np.where(j0 < j1, 1.0, -1.0)
+        k0, k1 = np.minimum(j0, j1), np.maximum(j0, j1)
+        du, dv = cu[k1] - cu[k0], cv[k1] - cv[k0]
+        ws.append(sign * (du * (pv - cv[k0]) - dv * (pu - cu[k0])))
+        # Top-left rule on the oriented edge, antisymmetric too
+        du, dv = sign * du, sign * dv
+        claims.append((dv > 0.0) | ((dv == 0.0) & (du < 0.0)))
+    w0, w1, w2 = ws
+    area = w0 + w1 + w2  # twice the signed projected area
+    orient = np.sign(area)
+    inside = orient != 0.0
+    for w, claim in zip(ws, claims):
+        w *= orient
+        # claim is for counterclockwise triangles
+        claim = np.where(orient > 0.0, claim, ~claim)
+        inside &= (w > 0.0) | ((w == 0.0) & claim)
+    # Interpolate a coordinate with barycentric coordinates
+    w0, w1, w2, area = w0[inside], w1[inside], w2[inside], np.abs(area[inside])
+    tris = tris[inside]
+    t = (w0 * ca[tris[:, 0]] + w1 * ca[tris[:, 1]] + w2 * ca[tris[:, 2]]) / area
+    return iu[inside], iv[inside], t
+
+
+# The voxels touched by the surface are solid too, as with the former REMESH
+# BLOCKS voxelization: thin parts of the solid are kept, even when they contain
+# no voxel center. So the solid voxels are those whose open box overlaps the solid.
+# A triangle touches a voxel when it enters its open box, by the separating axis
+# test on the box axes, the triangle normal, and the nine edge and box axes
+# cross products. Surface penetrations smaller than a tolerance are ignored,
+# so that faces lying on the voxel grid planes do not touch the voxels beyond.
+# The candidate voxels of each triangle are in the voxel columns along its
+# dominant normal axis d, where the triangle plane crosses a few voxels each.
+#  d ^   +---+
+#    |   |  /|
+#    |   +-/-+  two candidate voxels in the column
+#    |   |/  |
+#    |   /---+
+#    |  /
+#    +-----------> p
+
+_touch_tolerance = 1e-3  # min penetration of a touched voxel, in voxel units
+_max_columns = 1 << 16  # max number of candidate columns per chunk
+
+
+def _get_surface_voxels(co, tris, shape) -> "iterator of (ix, iy, iz)":
+    """!
+    Get the voxels touched by the triangles, in chunks.
+    @param co: the vertices adimensional coordinates, with voxel corners on integers.
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param shape: the number of voxels along x, y, z.
+    @return the iterator of touched voxels indices along x, y, z, with repetitions.
+    """
+    tol = _touch_tolerance
+    # Triangles coordinates in the p, q, d axes of their dominant normal axis d
+    normals = np.cross(co[tris[:, 1]] - co[tris[:, 0]], co[tris[:, 2]] - co[tris[:, 0]])
+    d = np.argmax(np.abs(normals), axis=1)
+    keep = np.abs(normals[np.arange(len(tris)), d]) > 0.0  # not degenerate
+    d, normals, tris = d[keep], normals[keep], tris[keep]
+    axes = np.column_stack(((d + 1) % 3, (d + 2) % 3, d))  # p, q, d, cyclic
+    pts = np.take_along_axis(co[tris], axes[:, None, :], axis=2)
+    normals = np.take_along_axis(normals, axes, axis=1)
+    shapes = np.asarray(shape)[axes]
+    t0, t1 = pts.min(axis=1), pts.max(axis=1)
+    # Get the candidate columns of each triangle from its bounding box
+    i0 = np.clip(np.floor(t0[:, :2] + tol), 0, shapes[:, :2]).astype(np.int64)
+    i1 = np.clip(np.ceil(t1[:, :2] - tol), 0, shapes[:, :2]).astype(np.int64)
+    nps, nqs = np.maximum(i1[:, 0] - i0[:, 0], 0), np.maximum(i1[:, 1] - i0[:, 1], 0)
+    counts = nps * nqs
+    starts = np.cumsum(counts) - counts
+    # Send triangles in chunks, to limit memory usage
+    j0 = 0
+    while j0 < len(tris):
+        j1 = int(np.searchsorted(starts, starts[j0] + _max_columns))
+        j1 = max(j1, j0 + 1)  # at least one triangle
+        itris = np.repeat(np.arange(j0, j1), counts[j0:j1])
+        if len(itris):
+            icols = np.arange(len(itris)) - (starts[itris] - starts[j0])
+            ip = i0[itris, 0] + icols // nqs[itris]
+            iq = i0[itris, 1] + icols % nqs[itris]
+            yield _touch_columns(pts, normals, t0, t1, shapes, axes, itris, ip, iq)
+        j0 = j1
+
+
+def _touch_columns(pts, normals, t0, t1, shapes, axes, itris, ip, iq):
+    """!
+    Get the voxels touched by the triangles in their candidate columns.
+    @param pts: the triangles coordinates along p, q, d, array of shape (n, 3, 3).
+    @param normals: the triangles normals along p, q, d, array of shape (n, 3).
+    @param t0: the triangles min coordinates along p, q, d.
+    @param t1: the triangles max coordinates along p, q, d.
+    @param shapes: the number of voxels along p, q, d of each triangle.
+    @param axes: the x, y, z axes of p, q, d of each triangle.
+    @param itris: the triangle index of each column.
+    @param ip: the column p indices.
+    @param iq: the column q indices.
+    @return the touched voxels indices along x, y, z, with repetitions.
+    """
+    tol = _touch_tolerance
+    # Get the candidate voxels of each column from the triangle plane
+    n = normals[itris]
+    dc = (
+        np.einsum("ij,ij->i", n, pts[itris, 0])
+        - n[:, 0] * (ip + 0.5)
+        - n[:, 1] * (iq + 0.5)
+    ) / n[:, 2]
+    h = 0.5 * (np.abs(n[:, 0]) + np.abs(n[:, 1])) / np.abs(n[:, 2])
+    lo = np.maximum(dc - h, t0[itris, 2])
+    hi = np.minimum(dc + h, t1[itris, 2])
+    nd = shapes[itris, 2]
+    id0 = np.clip(np.floor(lo + tol), 0, nd).astype(np.int64)
+    id1 = np.clip(np.ceil(hi - tol), 0, nd).astype(np.int64)
+    counts = np.maximum(id1 - id0, 0)
+    icols = np.repeat(np.arange(len(itris)), counts)
+    starts = np.cumsum(counts) - counts
+    ids = id0[icols] + np.arange(len(icols)) - starts[icols]
+    itris, ip, iq = itris[icols], ip[icols], iq[icols]
+    # Separating axis test, with voxel boxes centered in the origin
+    centers = ip + 0.5, iq + 0.5, ids + 0.5
+    (x0, y0, z0), (x1, y1, z1), (x2, y2, z2) = (
+        tuple(pts[itris, k, i] - centers[i] for i in range(3)) for k in range(3)
     )
-    # Prepare new vertices and insert them
-    verts = (
-        (bb[0], bb[2], bb[4]),
-        (bb[0], bb[2], bb[5]),
-        (bb[0], bb[3], bb[4]),
-        (bb[0], bb[3], bb[5]),
-        (bb[1], bb[2], bb[4]),
-        (bb[1], bb[2], bb[5]),
-        (bb[1], bb[3], bb[4]),
-        (bb[1], bb[3], bb[5]),
+    nx, ny, nz = n[icols, 0], n[icols, 1], n[icols, 2]
+    r = 0.5 * (np.abs(nx) + np.abs(ny) + np.abs(nz))
+    r -= tol * np.sqrt(nx * nx + ny * ny + nz * nz)
+    separated = np.abs(nx * x0 + ny * y0 + nz * z0) >= r  # triangle normal
+    # Edges and box axes cross products, the edge vertices have the same projection
+    for (xa, ya, za), (xb, yb, zb), (xc, yc, zc) in (
+        ((x0, y0, z0), (x1, y1, z1), (x2, y2, z2)),
+        ((x1, y1, z1), (x2, y2, z2), (x0, y0, z0)),
+        ((x2, y2, z2), (x0, y0, z0), (x1, y1, z1)),
+    ):
+        ex, ey, ez = xb - xa, yb - ya, zb - za
+        for (e0, e1), (pa0, pa1, pc0, pc1) in (
+            ((ey, ez), (za, ya, zc, yc)),  # edge x (1, 0, 0)
+            ((ez, ex), (xa, za, xc, zc)),  # edge x (0, 1, 0)
+            ((ex, ey), (ya, xa, yc, xc)),  # edge x (0, 0, 1)
+        ):
+            pa, pc = e0 * pa0 - e1 * pa1, e0 * pc0 - e1 * pc1
+            r = 0.5 * (np.abs(e0) + np.abs(e1)) - tol * np.sqrt(e0 * e0 + e1 * e1)
+            sep = (np.minimum(pa, pc) >= r) | (np.maximum(pa, pc) <= -r)
+            separated |= sep & ((e0 != 0.0) | (e1 != 0.0))
+    # Back to x, y, z axes
+    touched = ~separated
+    ijk = np.empty((np.count_nonzero(touched), 3), dtype=np.int64)
+    rows, taxes = np.arange(len(ijk)), axes[itris[touched]]
+    for i, indices in enumerate((ip, iq, ids)):
+        ijk[rows, taxes[:, i]] = indices[touched]
+    return ijk[:, 0], ijk[:, 1], ijk[:, 2]
+
+
+# Large grids are split in tiles, that are voxelized in run-length encoding
+# independently, in worker processes if available. Tiles span the whole grid
+# along the ray axis, so that each ray is traced by a single tile,
+# and cut the u axis in slabs, or both u and v axes if slabs are too large.
+# The runs of each tile are stitched into boxes across the tile seams and the
+# layers, so that the result does not depend on the tiling.
+# The tiling depends on the grid size only, not on the number of processes,
+# so that the same object always gets the same xbs.
+#  v ^
+#    +-------+-------+
+#    | tile  | tile  |
+#    |   0   |   1   |
+#    |       |       |
+#    +-------+-------+-> u
+#           seam
+
+_max_tile_size = 1 << 26  # max number of voxels of a dense grid
+_tile_size = 1 << 24  # max number of voxels per tile, when not dense
+
+
+def _get_tiles(shape) -> "axis, tiles":
+    """!
+    Split the voxel grid in tiles, along the axes normal to the ray axis.
+    @param shape: the number of voxels along x, y, z.
+    @return the ray axis, and the tiles as ((offset along x, y, z), shape).
+    """
+    a = int(np.argmax(shape))
+    u, v = (a + 1) % 3, (a + 2) % 3
+    size = shape[0] * shape[1] * shape[2]
+    if size <= _max_tile_size:  # dense
+        return a, [((0, 0, 0), tuple(shape))]
+    ntiles = -(-size // _tile_size)
+    # Prefer slabs, cut along u only, then square tiles
+    side_u, side_v = max(-(-shape[u] // ntiles), 1), max(shape[v], 1)
+    if side_u * side_v * shape[a] > _tile_size:
+        side_u = side_v = max(int(np.ceil(np.sqrt(shape[u] * shape[v] / ntiles))), 1)
+    tiles = list()
+    for ou in range(0, shape[u], side_u):
+        for ov in range(0, shape[v], side_v):
+            offset, tile_shape = [0, 0, 0], list(shape)
+            offset[u], tile_shape[u] = ou, min(side_u, shape[u] - ou)
+            offset[v], tile_shape[v] = ov, min(side_v, shape[v] - ov)
+            tiles.append((tuple(offset), tuple(tile_shape)))
+    return a, tiles or [((0, 0, 0), tuple(shape))]
+
+
+def _get_tiled_boxes(
+    verts, tris, origin, voxel_size, axis, tiles, processes, surface=True
+):
+    """!
+    Get merged boxes from the voxel grid, by tiles.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param origin: the world coordinates of the grid first corner.
+    @param voxel_size: the voxel size.
+    @param axis: the ray axis.
+    @param tiles: the tiles as ((offset along x, y, z), shape).
+    @param processes: number of processes voxelizing the tiles.
+    @param surface: if True the voxels touched by the surface are solid too.
+    @return the boxes.
+    """
+    # Get the triangles of each tile from their bounding box
+    sizes = np.broadcast_to(voxel_size, 3).tolist()  # cubic or not
+    co = (verts - origin) / sizes - 0.5  # voxel centers on integers
+    co_min, co_max = co[tris].min(axis=1), co[tris].max(axis=1)
+    seams = [i for i in range(3) if i != axis]
+    jobs = list()
+    for offset, shape in tiles:
+        selected = np.ones(len(tris), dtype=bool)
+        for i in seams:
+            selected &= co_max[:, i] >= offset[i] - 1
+            selected &= co_min[:, i] <= offset[i] + shape[i]
+        # Send only the used vertices
+        used, tile_tris = np.unique(tris[selected], return_inverse=True)
+        tile_origin = tuple(origin[i] + offset[i] * sizes[i] for i in range(3))
+        tile_tris = tile_tris.reshape(-1, 3)
+        jobs.append(
+            (verts[used], tile_tris, tile_origin, shape, voxel_size, axis, surface)
+        )
+    log.debug(f"{len(jobs)} tiles")
+    pool = processes > 1 and get_process_pool(processes) or None
+    if pool is None:  # serial
+        results = [_get_tile_boxes(*job) for job in jobs]
+    else:
+        with pool:
+            results = list(pool.map(_get_tile_boxes, *zip(*jobs)))
+    # Move boxes to grid integer coordinates
+    boxes = np.concatenate(
+        [boxes + np.repeat(offset, 2) for (offset, _), boxes in zip(tiles, results)]
     )
-    _insert_verts_into_mesh(ob.data, verts)
+    # Stitch boxes across the seams, then the layers
+    u, v = (axis + 1) % 3, (axis + 2) % 3
+    boxes = _stitch_boxes(boxes, v)
+    return _stitch_boxes(boxes, u)
+
+
+def _get_tile_boxes(
+    verts, tris, origin, shape, voxel_size, axis, surface=True
+) -> "boxes":
+    """!
+    Get the boxes of the runs of a tile, stitched along v, in tile integer coordinates.
+    @param verts: the tile vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the tile triangles vertex indices, array of shape (n, 3).
+    @param origin: the world coordinates of the tile first corner.
+    @param shape: the number of voxels of the tile along x, y, z.
+    @param voxel_size: the voxel size.
+    @param axis: the ray axis.
+    @param surface: if True the voxels touched by the surface are solid too.
+    @return the boxes, array of shape (n, 6).
+    """
+    runs = get_runs(verts, tris, origin, shape, voxel_size, axis, surface)
+    return _stitch_boxes(_get_run_boxes(runs, axis), (axis + 2) % 3)
+
+
+# Run-length encoding stores only the solid runs along the rays, as typed arrays:
+# memory grows with the mesh surface instead of the voxel grid volume.
+# The runs are obtained directly from the sorted ray hits, without any dense grid,
+# and are stitched into boxes along v, then along u.
+#  runs = [[iu, iv, ia0, ia1], ...]
+#  a ^
+#  3 +   +---+   +
+#    |   |###|   |    run = (1, 0, 0, 3)
+#  0 +---+###+---+->
+#    0   1   2   3 u
+
+
+def get_runs(
+    verts, tris, origin, shape, voxel_size, axis=None, surface=True
+) -> "array (n, 4)":
+    """!
+    Rasterize a closed triangle mesh on the voxel grid, in run-length encoding.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param origin: the world coordinates of the grid first corner.
+    @param shape: the number of voxels along x, y, z.
+    @param voxel_size: the voxel size, or the voxel sizes along x, y, z.
+    @param axis: the ray axis, or None for the longest one.
+    @param surface: if True the voxels touched by the surface are solid too.
+    @return the solid runs along the ray axis as (iu, iv, ia0, ia1), sorted by ray.
+    """
+    # Choose the ray axis a and the ray plane axes u, v, as in get_occupancy()
+    a = int(np.argmax(shape)) if axis is None else axis
+    u, v = (a + 1) % 3, (a + 2) % 3
+    nu, nv, na = shape[u], shape[v], shape[a]
+    toggles = [np.empty(0, dtype=np.int64)]
+    if nu and nv and na and len(tris):
+        # Adimensional coordinates, with voxel centers on integers
+        co = (verts - origin) / voxel_size - 0.5
+        for hits in _get_ray_hits(co[:, u], co[:, v], co[:, a], tris, nu, nv):
+            iu, iv, t = hits
+            ia = np.clip(np.floor(t).astype(np.int64) + 1, 0, na)
+            flat, counts = np.unique((iu * nv + iv) * (na + 1) + ia, return_counts=True)
+            toggles.append(flat[counts & 1 == 1])
+    # Toggles with an odd number of hits, before the ray end
+    flat, counts = np.unique(np.concatenate(toggles), return_counts=True)
+    rays, ia = np.divmod(flat[counts & 1 == 1], na + 1)
+    rays, ia = rays[ia < na], ia[ia < na]
+    # Close the runs left open at the ray end
+    ends, counts = np.unique(rays, return_counts=True)
+    ends = ends[counts & 1 == 1]
+    if len(ends):
+        rays = np.concatenate((rays, ends))
+        ia = np.concatenate((ia, np.full(len(ends), na)))
+        order = np.lexsort((ia, rays))
+        rays, ia = rays[order], ia[order]
+    # Pair the toggles of each ray in runs, as flat indices
+    starts = rays[0::2] * (na + 1) + ia[0::2]
+    ends = rays[0::2] * (na + 1) + ia[1::2]
+    # Add the voxels touched by the surface as one voxel runs
+    if surface and nu and nv and na and len(tris):
+        co = (verts - origin) / voxel_size
+        touched = [starts]
+        for ijk in _get_surface_voxels(co, tris, shape):
+            touched.append((ijk[u] * nv + ijk[v]) * (na + 1) + ijk[a])
+        touched = np.concatenate(touched)
+        starts, ends = touched, np.concatenate((ends, touched[len(starts) :] + 1))
+    # Merge the overlapping and touching runs of each ray,
+    # runs of different rays are apart by the flat index gap
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], np.maximum.accumulate(ends[order])
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = starts[1:] > ends[:-1]
+    last = np.roll(first, -1)  # the first one is always True
+    rays, ia0 = np.divmod(starts[first], na + 1)
+    ia1 = ends[last] - rays * (na + 1)
+    iu, iv = np.divmod(rays, max(nv, 1))
+    return np.column_stack((iu, iv, ia0, ia1)).astype(np.int32)
 
 
-def _insert_verts_into_mesh(me, verts):
+def _get_run_boxes(runs, axis) -> "array (n, 6)":
     """!
-    Insert vertices into mesh.
-    @param me: the Blender mesh.
-    @param verts: the vertices.
+    Transform runs to one voxel thick boxes.
+    @param runs: the runs along the ray axis as (iu, iv, ia0, ia1).
+    @param axis: the ray axis.
+    @return the boxes, array of shape (n, 6).
     """
-    bm = bmesh.new()
-    bm.from_mesh(me)
-    for v in verts:
-        bm.verts.new(v)
-    bm.to_mesh(me)
-    bm.free()
-    bpy.context.view_layer.update()  # push update
+    u, v = (axis + 1) % 3, (axis + 2) % 3
+    boxes = np.empty((len(runs), 6), dtype=np.int32)
+    boxes[:, axis * 2], boxes[:, axis * 2 + 1] = runs[:, 2], runs[:, 3]
+    boxes[:, u * 2], boxes[:, u * 2 + 1] = runs[:, 0], runs[:, 0] + 1
+    boxes[:, v * 2], boxes[:, v * 2 + 1] = runs[:, 1], runs[:, 1] + 1
+    return boxes
+
 
+def _stitch_boxes(boxes, axis) -> "array (n, 6)":
+    """!
+    Stitch boxes touching along axis, with the same section.
+    @param boxes: the boxes to handle, array of shape (n, 6).
+    @param axis: the stitching axis, 0, 1 or 2.
+    @return the stitched boxes.
+    """
+    if not len(boxes):
+        return boxes
+    i0, i1 = axis * 2, axis * 2 + 1
+    others = [i for i in range(6) if i not in (i0, i1)]
+    # Sort by section, then along axis
+    order = np.lexsort([boxes[:, i0]] + [boxes[:, i] for i in reversed(others)])
+    boxes = boxes[order]
+    # Chain each box to the previous one, if touching with the same section
+    chained = np.zeros(len(boxes), dtype=bool)
+    chained[1:] = boxes[1:, i0] == boxes[:-1, i1]
+    chained[1:] &= np.all(boxes[1:, others] == boxes[:-1, others], axis=1)
+    first = np.flatnonzero(~chained)
+    last = np.append(first[1:] - 1, len(boxes) - 1)
+    stitched = boxes[first]
+    stitched[:, i1] = boxes[last, i1]
+    return stitched
 
-# The following functions transform remesh modifier faces into boxes,
-# by raytracing along the requested axis. Each face is transformed into
-# integer coordinates according to a local origin (the first face center).
-# The faces are piled up, sorted, and transformed into solids:
-# Eg.: z axis --> pile 0|==solid==1| void 2|==solid==3| void ...
-# If solid is manifold, len(izs) is an even number:
-# go into solid at izs[0], get at last out of it at izs[-1].
-# In fact this piles can be easily transformed in boxes:
+
+# The following functions transform the occupancy grid into boxes,
+# by a greedy maximal cuboid decomposition. The voxel runs along the axis
+# with fewer solid faces (the longest runs) are scanned in order, and each
+# remaining run is grown into the largest box along the second axis, then
+# along the third one. Its voxels are then removed from the grid.
+# boxes are very alike XBs, but in integer coordinates:
 # (ix0, ix1, iy0, iy1, iz0, iz1)
-# boxes are very alike XBs, but in integer coordinates.
 
-# For example, with y faces:
+# For example, with runs along x, grown along y:
 #  y ^
-#    |     B
-#  3 +---+=x=+---+ F = (.5, 0): face origin (integer coordinates)
-#    |   H   H   | face A = (1, 0, 0)
-#  2 +---+---+---+ face B = (1, 3, 0)
-#    |   H   H   | O = (0, 0): box origin (integer coordinate)
-#  1 +---+---+---+ box AB = (1, 2, 0, 3, 0, 0)
-#    |   H   H   |
-#  0 +-F-+=x=+---+->
-#    0   1 A 2   3 x
-
-
-def _get_face_center(face):
-    """!
-    Get bmesh face center point.
-    @param face: the modifier face.
-    @param verts: the center coordinates.
-    """
-    xs, ys, zs = zip(*(v.co for v in face.verts))
-    return sum(xs) / len(xs), sum(ys) / len(ys), sum(zs) / len(zs)
-
-
-def _get_boxes_along_x(faces, voxel_size) -> "boxes, origin":
-    """!
-    Get minimal boxes from faces by raytracing along x axis.
-    @param faces: the modifier faces.
-    @param voxel_size: the voxel size of the object.
-    @return the minimal boxes and their origins.
-    """
-    log.debug("x boxes")
-    # First face center becomes origin of the integer grid for faces
-    f_origin = _get_face_center(faces[0])
-    hvs = voxel_size / 2.0  # half voxel size
-    origin = (f_origin[0], f_origin[1] - hvs, f_origin[2] - hvs)
-    # Get integer coordinates of faces and
-    # classify faces in integer piles along z
-    # piles = {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
-    piles = dict()
-    for face in faces:
-        center = _get_face_center(face)
-        ix, iy, iz = (
-            round((center[0] - f_origin[0]) / voxel_size),
-            round((center[1] - f_origin[1]) / voxel_size),
-            round((center[2] - f_origin[2]) / voxel_size),
-        )
-        try:
-            piles[(iy, iz)].append(ix)
-        except KeyError:
-            piles[(iy, iz)] = [ix]
-    # Create boxes by raytracing piles along axis
-    # boxes = [[ix0, ix1, iy0, iy1, iz0, iz1], ...]
-    boxes = list()
-    for (iy, iz), ixs in piles.items():
-        ixs.sort()  # sort in +x direction
-        while ixs:
-            ix1, ix0 = ixs.pop(), ixs.pop()  # pop solid volumes from top to bottom
-            boxes.append([ix0, ix1, iy, iy + 1, iz, iz + 1])
-    return boxes, origin
-
-
-def _get_boxes_along_y(faces, voxel_size) -> "boxes, origin":
-    """!
-    Get minimal boxes from faces by raytracing along y axis.
-    @param faces: the modifier faces.
-    @param voxel_size: the voxel size of the object.
-    @return the minimal boxes and their origins.
-    """
-    log.debug("y boxes")
-    # First face center becomes origin of the integer grid for faces
-    f_origin = _get_face_center(faces[0])
-    hvs = voxel_size / 2.0  # half voxel size
-    origin = (f_origin[0] - hvs, f_origin[1], f_origin[2] - hvs)
-    # Get integer coordinates of faces and
-    # classify faces in integer piles along z
-    # piles = {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
-    piles = dict()
-    for face in faces:
-        center = _get_face_center(face)
-        ix, iy, iz = (
-            round((center[0] - f_origin[0]) / voxel_size),
-            round((center[1] - f_origin[1]) / voxel_size),
-            round((center[2] - f_origin[2]) / voxel_size),
-        )
-        try:
-            piles[(iz, ix)].append(iy)
-        except KeyError:
-            piles[(iz, ix)] = [iy]
-    # Create boxes by raytracing piles along axis
-    # boxes = [[ix0, ix1, iy0, iy1, iz0, iz1], ...]
-    boxes = list()
-    for (iz, ix), iys in piles.items():
-        iys.sort()  # sort in +y direction
-        while iys:
-            iy1, iy0 = iys.pop(), iys.pop()  # pop solid volumes from top to bottom
-            boxes.append([ix, ix + 1, iy0, iy1, iz, iz + 1])
-    return boxes, origin
-
-
-def _get_boxes_along_z(faces, voxel_size) -> "boxes, origin":
-    """!
-    Get minimal boxes from faces by raytracing along z axis.
-    @param faces: the modifier faces.
-    @param voxel_size: the voxel size of the object.
-    @return the minimal boxes and their origins.
-    """
-    log.debug("z boxes")
-    # First face center becomes origin of the integer grid for faces
-    f_origin = _get_face_center(faces[0])
-    hvs = voxel_size / 2.0  # half voxel size
-    origin = (f_origin[0] - hvs, f_origin[1] - hvs, f_origin[2])
-    # Get integer coordinates of faces and
-    # classify faces in integer piles along z
-    # piles = {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
-    piles = dict()
-    for face in faces:
-        center = _get_face_center(face)
-        ix, iy, iz = (
-            round((center[0] - f_origin[0]) / voxel_size),
-            round((center[1] - f_origin[1]) / voxel_size),
-            round((center[2] - f_origin[2]) / voxel_size),
-        )
-        try:
-            piles[(ix, iy)].append(iz)
-        except KeyError:
-            piles[(ix, iy)] = [iz]
-    # Create boxes by raytracing piles along axis
+#    |
+#  3 +---+---+---+ O = (0, 0): box origin (integer coordinate)
+#    |   |###|   | run = (1, 2, 0, 1, 0, 1)
+#  2 +---+###+---+ box = (1, 2, 0, 3, 0, 1)
+#    |   |###|   |
+#  1 +---+###+---+
+#    |   |###|   |
+#  0 O---+---+---+->
+#    0   1   2   3 x
+
+
+def _get_boxes(occupancy, axes=None) -> "boxes":
+    """!
+    Get merged boxes from the occupancy grid.
+    @param occupancy: the boolean occupancy of the voxels.
+    @param axes: the run axis and the growing axes, or None to choose them.
+    @return the boxes.
+    """
+    if not occupancy.any():
+        return list()
+    # Order axes: runs along a, grown along b, then along c
+    if axes is None:  # sort axes by the number of solid faces normal to them
+        nfaces = list()
+        for axis in range(3):
+            diff = np.diff(occupancy, axis=axis, prepend=False, append=False)
+            nfaces.append(np.count_nonzero(diff))
+        axes = sorted(range(3), key=lambda axis: nfaces[axis])
+    a, b, c = axes
+    log.debug(f"{'xyz'[a]} runs, grow {'xyz'[b]}, {'xyz'[c]}")
+    remaining = np.transpose(occupancy, (c, b, a)).copy()
     # boxes = [[ix0, ix1, iy0, iy1, iz0, iz1], ...]
     boxes = list()
-    for (ix, iy), izs in piles.items():
-        izs.sort()  # sort in +z direction
-        while izs:
-            iz1, iz0 = izs.pop(), izs.pop()  # pop solid volumes from top to bottom
-            boxes.append([ix, ix + 1, iy, iy + 1, iz0, iz1])
-    return boxes, origin
-
-
-# The following functions reduce the number of boxes in xbs format,
-# used to describe the geometry, by merging them
-
-
-def _grow_boxes_along_x(boxes, sort_by):
-    """!
-    Grow boxes by merging neighbours along x axis.
-    @param boxes: the boxes to handle.
-    @param sort_by: TODO
-    @return the grown boxes.
-    """
-    log.debug("grow x")
-    # Sort boxes
-    boxes.sort(key=lambda box: (box[sort_by], box[0]))
-    # Grow boxes in -x direction, starting from last one
-    boxes_grown = list()
-    box = boxes.pop()
-    while boxes:
-        abox = boxes.pop()
-        # Check same iz0, iz1, iy0, iy1, and touching abox ix1 with box ix0
-        if (
-            abox[4] == box[4]
-            and abox[5] == box[5]
-            and abox[2] == box[2]
-            and abox[3] == box[3]
-            and abox[1] == box[0]
-        ):
-            box[0] = abox[0]  # grow box along -x
+    for ic, ib, ia0, ia1 in _get_runs(remaining).tolist():
+        # Part of the run could be already taken by previous boxes
+        run = remaining[ic, ib, ia0:ia1]
+        count = np.count_nonzero(run)  # faster than all() and any()
+        if count == run.size:
+            runs = ((ia0, ia1),)
+        elif count:
+            runs = (_get_row_runs(run) + ia0).tolist()
         else:
-            boxes_grown.append(box)  # stash the resulting box
-            box = abox  # init next cycle
-    # Stash the last one
-    boxes_grown.append(box)
-    return boxes_grown
-
-
-def _grow_boxes_along_y(boxes, sort_by):
-    """!
-    Grow boxes by merging neighbours along y axis.
-    @param boxes: the boxes to handle.
-    @param sort_by: TODO
-    @return the grown boxes.
-    """
-    log.debug("grow y")
-    # Sort boxes
-    boxes.sort(key=lambda box: (box[sort_by], box[2]))
-    # Grow boxes in -y direction, starting from last one
-    boxes_grown = list()
-    box = boxes.pop()
-    while boxes:
-        abox = boxes.pop()
-        # Check same iz0, iz1, ix0, ix1, and touching abox iy1 with box iy0
-        if (
-            abox[4] == box[4]
-            and abox[5] == box[5]
-            and abox[0] == box[0]
-            and abox[1] == box[1]
-            and abox[3] == box[2]
-        ):
-            box[2] = abox[2]  # grow box along -y
-        else:
-            boxes_grown.append(box)  # stash the resulting box
-            box = abox  # init next cycle
-    # Stash the last one
-    boxes_grown.append(box)
-    return boxes_grown
-
-
-def _grow_boxes_along_z(boxes, sort_by):
-    """!
-    Grow boxes by merging neighbours along z axis.
-    @param boxes: the boxes to handle.
-    @param sort_by: TODO
-    @return the grown boxes.
-    """
-    log.debug("grow z")
-    # Sort boxes
-    boxes.sort(key=lambda box: (box[sort_by], box[4]))
-    # Grow boxes in -z direction, starting from last one
-    boxes_grown = list()
-    box = boxes.pop()
-    while boxes:
-        abox = boxes.pop()
-        # Check same iy0, iy1, ix0, ix1, and touching abox iz1 with box iz0
-        if (
-            abox[2] == box[2]
-            and abox[3] == box[3]
-            and abox[0] == box[0]
-            and abox[1] == box[1]
-            and abox[5] == box[4]
-        ):
-            box[4] = abox[4]  # grow box along -z
-        else:
-            boxes_grown.append(box)  # stash the resulting box
-            box = abox  # init next cycle
-    # Stash the last one
-    boxes_grown.append(box)
-    return boxes_grown
+            continue
+        for ja0, ja1 in runs:
+            # Grow along b, then along c
+            jb1 = ib + _get_leading_layers(remaining[ic, ib:, ja0:ja1])
+            jc1 = ic + _get_leading_layers(remaining[ic:, ib:jb1, ja0:ja1])
+            remaining[ic:jc1, ib:jb1, ja0:ja1] = False
+            box = [0] * 6
+            box[a * 2], box[a * 2 + 1] = ja0, ja1
+            box[b * 2], box[b * 2 + 1] = ib, jb1
+            box[c * 2], box[c * 2 + 1] = ic, jc1
+            boxes.append(box)
+    return boxes
+
+
+def _get_runs(mask) -> "array (n, ndim + 1)":
+    """!
+    Get the runs of True values along the last axis.
+    @param mask: the boolean array.
+    @return the runs, as indices of the run row followed by start and end.
+    """
+    diff = np.diff(mask.astype(np.int8), axis=-1, prepend=0, append=0)
+    starts, ends = np.argwhere(diff == 1), np.argwhere(diff == -1)  # same row order
+    return np.column_stack((starts, ends[:, -1]))
+
+
+def _get_row_runs(row) -> "array (n, 2)":
+    """!
+    Get the runs of True values of a row.
+    @param row: the boolean 1D array.
+    @return the runs, as start and end.
+    """
+    padded = np.concatenate(([False], row, [False]))
+    return np.flatnonzero(padded[1:] != padded[:-1]).reshape(-1, 2)
+
+
+def _get_leading_layers(block) -> "int":
+    """!
+    Get the number of leading layers of the block that are all True.
+    Layers are checked in chunks of growing size, to limit numpy calls.
+    @param block: the boolean array, layered along its first axis.
+    @return the number of leading layers all True.
+    """
+    n, step = 0, 1
+    while n < len(block):
+        chunk = block[n : n + step]
+        if np.count_nonzero(chunk) < chunk.size:  # check each layer of the chunk
+            layers = chunk.reshape(len(chunk), -1).all(axis=1)
+            return n + int(layers.argmin())
+        n, step = n + len(chunk), step * 2
+    return n
+
+
+# Union voxelization
+
+# Solids sharing the same boundary conditions are rasterized on a common grid,
+# aligned to world origin, so that boxes are merged across their boundaries.
+# Only solids with touching or overlapping grids are grouped in clusters,
+# each cluster with its own grid. The source solids of each box are tracked.
+
+
+def calc_union_voxels(
+    meshes, voxel_size, scale_length
+) -> "[(indices, xbs, sources), ...]":
+    """!
+    Calc the union voxels of closed triangle meshes in xbs format, by cluster.
+    @param meshes: the vertices and triangles of each mesh, in world coo, as in calc_voxels.
+    @param voxel_size: the voxel size.
+    @param scale_length: the scale to use.
+    @return the mesh indices of each cluster of two or more meshes, its xbs, and the mesh indices of each xb.
+    """
+    grids = [_get_voxel_grid(verts, voxel_size) for verts, _ in meshes]
+    p0 = np.array([np.round(np.array(o) / voxel_size) for o, _ in grids], dtype=int)
+    p1 = p0 + np.array([shape for _, shape in grids], dtype=int)
+    results = list()
+    for indices in _get_clusters(p0, p1):
+        if len(indices) < 2:
+            continue
+        c0, c1 = p0[indices].min(axis=0), p1[indices].max(axis=0)
+        if np.prod(c1 - c0) > _max_tile_size:
+            log.warning(f"Union grid too large, {len(indices)} solids kept apart")
+            continue
+        # Rasterize each mesh on its own grid, as when alone, then join
+        union = np.zeros(c1 - c0, dtype=bool)
+        occupancies = list()  # (offset, occupancy)
+        for i in indices:
+            (verts, tris), (origin, shape) = meshes[i], grids[i]
+            occupancy = get_occupancy(verts, tris, origin, shape, voxel_size)
+            offset = p0[i] - c0
+            union[tuple(slice(o, o + n) for o, n in zip(offset, shape))] |= occupancy
+            occupancies.append((offset, occupancy))
+        boxes = _get_boxes(union)
+        sources = [
+            tuple(
+                i
+                for i, (offset, occupancy) in zip(indices, occupancies)
+                if _has_voxels(occupancy, offset, box)
+            )
+            for box in boxes
+        ]
+        origin = tuple((c0 * voxel_size).tolist())
+        xbs = _get_box_xbs(boxes, origin, voxel_size, scale_length)
+        results.append((indices, xbs, sources))
+    return results
+
+
+def _get_clusters(p0, p1) -> "[indices, ...]":
+    """!
+    Get the clusters of touching or overlapping boxes.
+    @param p0: the boxes first corners, array of shape (n, 3).
+    @param p1: the boxes last corners, array of shape (n, 3).
+    @return the lists of box indices of each cluster.
+    """
+    parents = list(range(len(p0)))
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]  # path halving
+            i = parents[i]
+        return i
+
+    for i in range(len(p0)):
+        touching = np.all((p0[i] <= p1[i + 1 :]) & (p0[i + 1 :] <= p1[i]), axis=1)
+        for j in np.flatnonzero(touching) + i + 1:
+            parents[find(int(j))] = find(i)
+    clusters = dict()
+    for i in range(len(p0)):
+        clusters.setdefault(find(i), list()).append(i)
+    return list(clusters.values())
+
+
+def _has_voxels(occupancy, offset, box) -> "bool":
+    """!
+    Check if the occupancy grid has solid voxels inside the box.
+    @param occupancy: the boolean occupancy of the voxels.
+    @param offset: the occupancy grid offset, in box integer coordinates.
+    @param box: the box.
+    @return True if solid voxels are found.
+    """
+    window = list()
+    for i, (o, n) in enumerate(zip(offset, occupancy.shape)):
+        i0, i1 = max(box[i * 2] - o, 0), min(box[i * 2 + 1] - o, n)
+        if i0 >= i1:
+            return False
+        window.append(slice(i0, i1))
+    return bool(occupancy[tuple(window)].any())
 
 
 # Transform boxes in integer coordinates, back to world coordinates
@@ -501,28 +1143,32 @@ def _grow_boxes_along_z(boxes, sort_by):
 def _get_box_xbs(boxes, origin, voxel_size, scale_length) -> "xbs":
     """!
     Transform boxes to xbs in world coordinates.
-    @param boxes: the boxes to handle.
-    @param origin: TODO
-    @param voxel_size: the voxel size of the object.
+    @param boxes: the boxes to handle, list or array of shape (n, 6).
+    @param origin: the world coordinates of the grid first corner.
+    @param voxel_size: the voxel size, or the voxel sizes along x, y, z.
     @param scale_length: the scale to use.
     @return the xbs.
     """
     epsilon = 1e-5
-    return (
-        (
-            (origin[0] + box[0] * voxel_size - epsilon) * scale_length,
-            (origin[0] + box[1] * voxel_size + epsilon) * scale_length,
-            (origin[1] + box[2] * voxel_size - epsilon) * scale_length,
-            (origin[1] + box[3] * voxel_size + epsilon) * scale_length,
-            (origin[2] + box[4] * voxel_size - epsilon) * scale_length,
-            (origin[2] + box[5] * voxel_size + epsilon) * scale_length,
-        )
-        for box in boxes
-    )
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 6)
+    sizes = np.repeat(np.broadcast_to(voxel_size, 3), 2)  # cubic or not
+    xbs = np.repeat(origin, 2) + boxes * sizes + np.tile((-epsilon, epsilon), 3)
+    return list(map(tuple, (xbs * scale_length).tolist()))
 
 
 # Pixelization
 
+# Flat objects are rasterized directly on the plane normal to their flat axis.
+# Edges shared by an even number of triangles cancel out, the remaining ones are
+# the polygon boundary. Scanlines along u pass through the pixel centers,
+# each boundary edge crossing toggles the pixels after it, and the toggles are
+# accumulated along the scanlines (even-odd rule).
+# Pixels are merged in rectangles, and then flattened at the object center.
+#  v ^     +----------+
+#    | ----|-->xxxxxx-|-->  scanline
+#    |     +----------+
+#    +-----------------> u
+
 
 def get_pixels(context, ob, scale_length):
     """!
@@ -538,76 +1184,118 @@ def get_pixels(context, ob, scale_length):
         raise BFException(ob, "Object can not be converted to mesh.")
     if not ob.data.vertices:
         raise BFException(ob, "Empty object!")
-    voxel_size = _get_voxel_size(context, ob)
-    # Get evaluated ob (eg. modifiers applied) and its Mesh
-    dg = context.evaluated_depsgraph_get()
-    ob_eval = ob.evaluated_get(dg)  # no need to clean up, it is tmp
-    me_eval = bpy.data.meshes.new_from_object(ob_eval)  # static
-    # Create a new Object, in world coo
-    ob_copy = bpy.data.objects.new(f"{ob.name}_voxels_tmp", me_eval)
-    ob_copy.data.transform(ob.matrix_world)
-    context.collection.objects.link(ob_copy)
-    # Set data for ob_copy
-    ob_copy.bf_xb_custom_voxel = ob.bf_xb_custom_voxel
-    ob_copy.bf_xb_center_voxels = ob.bf_xb_center_voxels
-    ob_copy.bf_xb_voxel_size = ob.bf_xb_voxel_size
-    # Get flat axis of evaluated ob
-    flat_axis = _get_flat_axis(ob_copy, voxel_size)
+    voxel_size = get_voxel_size(context, ob)
+    # Get evaluated mesh (eg. modifiers applied) triangles, in world coo
+    with utils.get_evaluated_mesh(context, ob) as me:
+        verts = utils.get_verts_array(me, matrix=ob.matrix_world)
+        tris, _ = utils.get_triangles_arrays(me)
+    if not len(tris):
+        raise BFException(ob, "Empty object!")
     # Check how flat it is
-    if ob_copy.dimensions[flat_axis] > voxel_size / 2.0:
-        bpy.data.meshes.remove(ob_copy.data, do_unlink=True)
+    flat_axis = _get_flat_axis(verts)
+    if np.ptp(verts[:, flat_axis]) > voxel_size / 2.0:
         raise BFException(ob, "Object is not flat enough.")
-    # Get origin for flat xbs
-    bbox = utils.get_bbox_xbs(context, ob_copy, scale_length)
-    flat_origin = (
-        (bbox[1] + bbox[0]) / 2.0,
-        (bbox[3] + bbox[2]) / 2.0,
-        (bbox[5] + bbox[4]) / 2.0,
-    )
-    # Add solidify modifier
-    _add_solidify_mod(context, ob_copy, voxel_size)
-    # Voxelize (already corrected for unit_settings)
-    try:
-        xbs, voxel_size = get_voxels(context, ob_copy, scale_length)
-    except BFException as err:
+    # Pixelize
+    xbs = calc_pixels(verts, tris, voxel_size, ob.bf_xb_center_voxels, scale_length)
+    if not xbs:
         raise BFException(ob, "No pixel created!")
-    finally:
-        bpy.data.meshes.remove(ob_copy.data, do_unlink=True)  # clean up
-    # Flatten the solidified object xbs
+    return xbs, voxel_size * scale_length
+
+
+def calc_pixels(verts, tris, voxel_size, centered, scale_length) -> "xbs":
+    """!
+    Calc pixels from a flat triangle mesh in xbs format.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param voxel_size: the voxel size.
+    @param centered: if True align pixels to the mesh center, else to world origin.
+    @param scale_length: the scale to use.
+    @return the pixels in xbs format, empty if none.
+    """
+    flat_axis = _get_flat_axis(verts)
+    origin, shape = _get_voxel_grid(verts, voxel_size, centered)
+    shape = list(shape)
+    shape[flat_axis] = 1
+    boxes = _get_boxes(get_coverage(verts, tris, origin, shape, voxel_size, flat_axis))
+    xbs = _get_box_xbs(boxes, origin, voxel_size, scale_length)
+    # Flatten at the object center along the flat axis
+    flat_origin = (verts.min(axis=0) + verts.max(axis=0)) / 2.0 * scale_length
     choice = (_x_flatten_xbs, _y_flatten_xbs, _z_flatten_xbs)[flat_axis]
-    xbs = choice(xbs, flat_origin)
-    return xbs, voxel_size
+    return choice(xbs, flat_origin.tolist())
 
 
-def _add_solidify_mod(context, ob, voxel_size) -> "modifier":
+def get_coverage(verts, tris, origin, shape, voxel_size, axis) -> "array (nx, ny, nz)":
     """!
-    Add new solidify modifier.
-    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
-    @param ob: the Blender object.
-    @param voxel_size: the voxel size of the object.
-    @return the modifier.
+    Rasterize a flat triangle mesh on the pixel grid, projecting it along the axis.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param origin: the world coordinates of the grid first corner.
+    @param shape: the number of pixels along x, y, z, one along the axis.
+    @param voxel_size: the voxel size.
+    @param axis: the projection axis, normal to the pixel grid.
+    @return the boolean coverage of the pixels, True if solid.
     """
-    mo = ob.modifiers.new("solidify_tmp", "SOLIDIFY")
-    mo.thickness = voxel_size * 3
-    mo.offset = 0.0  # centered
-    return mo
+    u, v = (axis + 1) % 3, (axis + 2) % 3
+    nu, nv = shape[u], shape[v]
+    toggles = np.zeros((nv, nu + 1), dtype=np.uint8)
+    if nu and nv and len(tris):
+        # Adimensional coordinates, with pixel centers on integers
+        co = (verts - origin) / voxel_size - 0.5
+        cu, cv = co[:, u], co[:, v]
+        # Get the boundary edges, used by an odd number of triangles
+        edges = np.sort(tris[:, ((0, 1), (1, 2), (2, 0))].reshape(-1, 2), axis=1)
+        edges, counts = np.unique(edges, axis=0, return_counts=True)
+        edges = edges[counts & 1 == 1]
+        for iu, iv in _get_scanline_hits(cu, cv, edges, nv):
+            iu = np.clip(np.floor(iu).astype(np.int64) + 1, 0, nu)
+            flat, counts = np.unique(iv * (nu + 1) + iu, return_counts=True)
+            toggles.reshape(-1)[flat[counts & 1 == 1]] ^= 1
+    # Accumulate toggles along the scanlines
+    coverage = np.bitwise_xor.accumulate(toggles[:, :nu], axis=1).view(bool)
+    # Back to x, y, z axes
+    coverage = coverage.T.reshape(nu, nv, 1)
+    return np.transpose(coverage, [(u, v, axis).index(i) for i in range(3)])
 
 
-def _get_flat_axis(ob, voxel_size):
+def _get_scanline_hits(cu, cv, edges, nv) -> "iterator of (u, iv)":
     """!
-    Get object flat axis.
-    @param ob: the Blender object.
-    @param voxel_size: the voxel size of the object.
-    @return the object flat axis.
-    """
-    dimensions = ob.dimensions
-    choices = [
-        (dimensions[0], 0),  # object faces are normal to x axis
-        (dimensions[1], 1),  # ... to y axis
-        (dimensions[2], 2),  # ... to z axis
-    ]
-    choices.sort(key=lambda k: k[0])  # sort by dimension
-    return choices[0][1]
+    Get the scanline hits of the edges, in chunks.
+    Scanlines are parallel to the u axis, and pass through integer v coordinates.
+    Each edge hits the scanlines in its half-open v range, so that vertices
+    shared by two edges are hit once.
+    @param cu: the vertices u coordinates.
+    @param cv: the vertices v coordinates.
+    @param edges: the edges vertex indices, array of shape (n, 2).
+    @param nv: the number of scanlines.
+    @return the iterator of hit u coordinates and scanline v indices.
+    """
+    u0, u1 = cu[edges[:, 0]], cu[edges[:, 1]]
+    v0, v1 = cv[edges[:, 0]], cv[edges[:, 1]]
+    vmin, vmax = np.minimum(v0, v1), np.maximum(v0, v1)
+    iv0 = np.clip(np.ceil(vmin), 0, nv).astype(np.int64)
+    iv1 = np.clip(np.ceil(vmax), 0, nv).astype(np.int64)
+    counts = np.maximum(iv1 - iv0, 0)
+    starts = np.cumsum(counts) - counts
+    # Send edges in chunks, to limit memory usage
+    i0 = 0
+    while i0 < len(edges):
+        i1 = int(np.searchsorted(starts, starts[i0] + _max_hits))
+        i1 = max(i1, i0 + 1)  # at least one edge
+        iedges = np.repeat(np.arange(i0, i1), counts[i0:i1])
+        if len(iedges):
+            iv = iv0[iedges] + np.arange(len(iedges)) - (starts[iedges] - starts[i0])
+            t = (iv - v0[iedges]) / (v1[iedges] - v0[iedges])
+            yield u0[iedges] + t * (u1[iedges] - u0[iedges]), iv
+        i0 = i1
+
+
+def _get_flat_axis(verts) -> "axis":
+    """!
+    Get the flat axis of a mesh.
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @return the axis of the smallest mesh dimension.
+    """
+    return int(np.argmin(np.ptp(verts, axis=0)))
 
 
 def _x_flatten_xbs(xbs, flat_origin) -> "[(l0, l0, y0, y1, z0, z1), ...]":
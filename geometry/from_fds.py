@@ -5,6 +5,8 @@ BlenderFDS, translate geometry from FDS notation to a Blender mesh.
 import bpy, logging
 from time import time
 
+import numpy as np
+
 log = logging.getLogger(__name__)
 
 epsilon = 1e-5  # TODO unify epsilon mgmt
@@ -32,34 +34,36 @@ def geom_to_mesh(fds_surfids, fds_verts, fds_faces, context, me, scale_length):
                 break
         if not found:
             raise Exception(f"Unknown SURF_ID <{surfid}>")
-    # Treat fds_verts and fds_faces
-    nverts, nfaces = len(fds_verts) // 3, len(fds_faces) // 4
-    if nverts * 3 != len(fds_verts):
+    # Treat fds_verts and fds_faces, as typed arrays
+    verts = np.asarray(fds_verts, dtype=np.float64)
+    faces = np.asarray(fds_faces, dtype=np.int64)
+    nverts, nfaces = len(verts) // 3, len(faces) // 4
+    if nverts * 3 != len(verts):
         raise Exception(f"Wrong VERTS len in <{fds_verts}>")
-    if nfaces * 4 != len(fds_faces):
+    if nfaces * 4 != len(faces):
         raise Exception(f"Wrong FACES len in <{fds_faces}>")
-    verts = [
-        (
-            fds_verts[i * 3] / scale_length,
-            fds_verts[i * 3 + 1] / scale_length,
-            fds_verts[i * 3 + 2] / scale_length,
-        )
-        for i in range(nverts)
-    ]
-    edges = list()
-    faces = [
-        (fds_faces[i * 4] - 1, fds_faces[i * 4 + 1] - 1, fds_faces[i * 4 + 2] - 1)
-        for i in range(nfaces)
-    ]
-    imats = [fds_faces[i * 4 + 3] - 1 for i in range(nfaces)]
-    # Check imats
-    if max(imats) > len(me.materials) - 1:
-        raise Exception(f"Wrong SURF_ID len in <{me.materials}>")
-    # Create mesh
-    me.from_pydata(verts, edges, faces)
-    # Assign materials to faces
-    for iface, face in enumerate(me.polygons):
-        face.material_index = imats[iface]
+    verts = (verts / scale_length).astype(np.float32)
+    faces = faces.reshape(-1, 4) - 1
+    loops = faces[:, :3].astype(np.int32).ravel()
+    imats = faces[:, 3].astype(np.int32)
+    # Check faces and imats
+    if nfaces:
+        if loops.min() < 0 or loops.max() > nverts - 1:
+            raise Exception(f"Wrong FACES vertex index in <{fds_faces}>")
+        if imats.max() > len(me.materials) - 1:
+            raise Exception(f"Wrong SURF_ID len in <{me.materials}>")
+    # Create mesh and assign materials to faces
+    me.vertices.add(nverts)
+    me.vertices.foreach_set("co", verts)
+    me.loops.add(nfaces * 3)
+    me.loops.foreach_set("vertex_index", loops)
+    me.polygons.add(nfaces)
+    me.polygons.foreach_set(
+        "loop_start", np.arange(0, nfaces * 3, 3, dtype=np.int32)
+    )
+    me.polygons.foreach_set("loop_total", np.full(nfaces, 3, dtype=np.int32))
+    me.polygons.foreach_set("material_index", imats)
+    me.update(calc_edges=True)
 
 
 def geom_to_ob(fds_surfids, fds_verts, fds_faces, context, ob, scale_length):
@@ -4,14 +4,57 @@ BlenderFDS, translate Blender object geometry to FDS notation.
 
 import bpy, logging
 from time import time
+from functools import partial
+
+import numpy as np
+
 from . import utils
+from . import cache
 from . import calc_voxels
 from . import calc_trisurfaces
 from ..types import BFException
+from ..utils import get_process_pool
 
 log = logging.getLogger(__name__)
 
 
+# Cache fingerprints
+
+
+def _get_fingerprint(context, ob, *args) -> "tuple":
+    """!
+    Return the fingerprint of a geometric cache entry of an object.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @param args: other inputs the cached result depends on.
+    @return the fingerprint.
+    """
+    return (ob.name, cache.get_mesh_hash(context, ob), *args)
+
+
+def _get_matrix(ob, translation=True) -> "tuple":
+    """!
+    Return the object world matrix as a flat tuple.
+    @param ob: the Blender object.
+    @param translation: if False, return only the linear part (rotation, scale).
+    @return the matrix values.
+    """
+    m, n = ob.matrix_world, translation and 4 or 3
+    return tuple(m[i][j] for i in range(n) for j in range(n))
+
+
+def _get_surfids(ob) -> "tuple":
+    """!
+    Return the referenced SURF state of the object material slots.
+    @param ob: the Blender object.
+    @return ((name, bf_surf_export), ...), None for empty slots.
+    """
+    return tuple(
+        (s.material.name, s.material.bf_surf_export) if s.material else None
+        for s in ob.material_slots
+    )
+
+
 # to GEOM
 
 
@@ -25,6 +68,38 @@ def _ob_to_geom(context, ob, scale_length, check=True, world=True):
     @param world: True to return the object in world coordinates.
     @return FDS GEOM notation as lists and message.
     """
+    return _calc_geom(*_get_geom_arrays(context, ob, scale_length, check, world))
+
+
+def _get_geom_arrays(
+    context, ob, scale_length, check, world
+) -> "fds_surfids, verts, tris, material_indices, dt":
+    """!
+    Get Object evaluated mesh arrays for GEOM notation, checked.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @param scale_length: the scale to use.
+    @param check: True to check the bmesh sanity.
+    @param world: True to return the object in world coordinates.
+    @return the referenced surf_id, the mesh arrays, and the time spent.
+    """
+    t0 = time()
+    fds_surfids, verts, tris, material_indices = calc_trisurfaces.get_trisurface_arrays(
+        context=context, ob=ob, scale_length=scale_length, check=check, world=world
+    )
+    return fds_surfids, verts, tris, material_indices, time() - t0
+
+
+def _calc_geom(fds_surfids, verts, tris, material_indices, dt=0.0):
+    """!
+    Transform triangulated surface arrays to FDS notation.
+    @param fds_surfids: the referenced surf_id.
+    @param verts: the vertices coordinates, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param material_indices: the triangles material indices.
+    @param dt: the time spent getting the arrays.
+    @return FDS GEOM notation as lists and message.
+    """
     t0 = time()
     (
         fds_surfids,
@@ -33,14 +108,34 @@ def _ob_to_geom(context, ob, scale_length, check=True, world=True):
         fds_surfs,
         fds_volus,
         fds_faces_surfs,
-    ) = calc_trisurfaces.get_fds_trisurface(
-        context=context, ob=ob, scale_length=scale_length, check=check, world=world
+    ) = calc_trisurfaces.calc_fds_trisurface(
+        fds_surfids, verts, tris, material_indices
     )
-    dt = time() - t0
+    dt += time() - t0
     msg = f"GEOM: {len(fds_verts)} vertices, {len(fds_faces)} faces, in {dt:.3f} s"
     return fds_surfids, fds_verts, fds_faces, fds_surfs, fds_volus, fds_faces_surfs, msg
 
 
+def _get_geom_fingerprint(context, ob, scale_length, check, world) -> "tuple":
+    """!
+    Return the fingerprint of the geom cache entry of an object.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @param scale_length: the scale to use.
+    @param check: True to check the bmesh sanity.
+    @param world: True to return the object in world coordinates.
+    @return the fingerprint.
+    """
+    return _get_fingerprint(
+        context,
+        ob,
+        scale_length,
+        _get_surfids(ob),
+        check and calc_trisurfaces.get_epsilons(context),
+        world and _get_matrix(ob),  # MOVE exports local coordinates
+    )
+
+
 def ob_to_geom(context, ob, scale_length, check=True, world=True):
     """!
     Transform Object geometry to FDS notation.
@@ -52,12 +147,70 @@ def ob_to_geom(context, ob, scale_length, check=True, world=True):
     @return FDS GEOM notation as lists and message.
     """
     log.debug(ob.name)
-    if ob.get("ob_to_geom_cache") is None:  # recalc
+    fingerprint = _get_geom_fingerprint(context, ob, scale_length, check, world)
+    result = cache.get(ob, "geom", fingerprint)
+    if result is not None:
+        return result
+    result = _load_geom(ob, key=fingerprint[1:])
+    if result is None:  # recalc
         log.debug(f"Update <{ob.name}> geom cache")
-        ob["ob_to_geom_cache"] = _ob_to_geom(
-            context=context, ob=ob, scale_length=scale_length, check=check, world=world
-        )
-    return ob["ob_to_geom_cache"]
+        try:
+            result = _ob_to_geom(
+                context=context,
+                ob=ob,
+                scale_length=scale_length,
+                check=check,
+                world=world,
+            )
+        except BFException as err:  # eg. sanity check failed
+            cache.save("geom", fingerprint[1:], error=err.msg)
+            raise
+        _save_geom(key=fingerprint[1:], result=result)
+    cache.put(ob, "geom", fingerprint, result)
+    return result
+
+
+def _load_geom(ob, key):
+    """!
+    Load GEOM notation from the on-disk cache.
+    @param ob: the Blender object.
+    @param key: the cache fingerprint without the object name.
+    @return FDS GEOM notation as lists and message, or None if missing.
+    """
+    data = cache.load("geom", key)
+    if data is None:
+        return None
+    if "error" in data:  # cached sanity check result
+        raise BFException(ob, str(data["error"]))
+    return (
+        data["surfids"].tolist(),
+        data["verts"].tolist(),
+        data["faces"].tolist(),
+        data["surfs"].tolist(),
+        data["volus"].tolist(),
+        data["faces_surfs"].tolist(),
+        str(data["msg"]),
+    )
+
+
+def _save_geom(key, result):
+    """!
+    Save GEOM notation to the on-disk cache.
+    @param key: the cache fingerprint without the object name.
+    @param result: FDS GEOM notation as lists and message.
+    """
+    surfids, verts, faces, surfs, volus, faces_surfs, msg = result
+    cache.save(
+        "geom",
+        key,
+        surfids=np.array(surfids, dtype=str),
+        verts=np.array(verts, dtype=np.float64),
+        faces=np.array(faces, dtype=np.int64),
+        surfs=np.array(surfs, dtype=np.int64),
+        volus=np.array(volus, dtype=np.int64),
+        faces_surfs=np.array(faces_surfs, dtype=np.int64),
+        msg=msg,
+    )
 
 
 # to XB
@@ -73,6 +226,8 @@ def _ob_to_xbs_voxels(
     @param scale_length: the scale to use.
     @return xbs notation and any error message.
     """
+    if not ob.bf_xb_snap_to_mesh:  # snapped voxels are bounded by the MESH cells
+        calc_voxels.check_voxels_estimate(ob, get_voxels_estimate(context, ob))
     t0 = time()
     xbs, voxel_size = calc_voxels.get_voxels(context, ob, scale_length)
     dt = time() - t0
@@ -80,6 +235,108 @@ def _ob_to_xbs_voxels(
     return xbs, msg
 
 
+def _get_xbs_voxels_arrays(
+    context, ob, scale_length
+) -> "verts, tris, voxel_size, centered, scale_length, dt":
+    """!
+    Get Object evaluated mesh arrays for xbs notation (voxelization), within budget.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object, not snapped to the MESH cells.
+    @param scale_length: the scale to use.
+    @return the vertices in world coo, the triangles, the voxelization parameters, and the time spent.
+    """
+    calc_voxels.check_voxels_estimate(ob, get_voxels_estimate(context, ob))
+    t0 = time()
+    with utils.get_evaluated_mesh(context, ob) as me:
+        verts = utils.get_verts_array(me, matrix=ob.matrix_world)
+        tris, _ = utils.get_triangles_arrays(me)
+    if not len(tris):
+        raise BFException(ob, "Empty object!")
+    voxel_size = calc_voxels.get_voxel_size(context, ob)
+    centered = ob.bf_xb_center_voxels
+    return verts, tris, voxel_size, centered, scale_length, time() - t0
+
+
+def _calc_xbs_voxels(
+    verts, tris, voxel_size, centered, scale_length, dt=0.0
+) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
+    """!
+    Transform mesh arrays solid geometry to xbs notation (voxelization).
+    @param verts: the vertices coordinates in world coo, array of shape (n, 3).
+    @param tris: the triangles vertex indices, array of shape (n, 3).
+    @param voxel_size: the voxel size.
+    @param centered: if True align voxels to the mesh center, else to world origin.
+    @param scale_length: the scale to use.
+    @param dt: the time spent getting the arrays.
+    @return xbs notation, empty if none, and message.
+    """
+    t0 = time()
+    xbs = calc_voxels.calc_voxels(verts, tris, voxel_size, centered, scale_length)
+    dt += time() - t0
+    res = voxel_size * scale_length
+    msg = f"XB: {len(xbs)} voxels, resolution {res:.3f} m, in {dt:.3f} s"
+    return xbs, msg
+
+
+def get_voxels_estimate(context, ob) -> "ngrid, nvoxels, nxbs, memory, runtime":
+    """!
+    Get the cost estimate of the Object voxelization, before running it.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @return the estimate, see calc_voxels.calc_voxels_estimate().
+    """
+    voxel_size = calc_voxels.get_voxel_size(context, ob)
+    centered = ob.bf_xb_center_voxels
+    fingerprint = _get_fingerprint(context, ob, _get_matrix(ob), voxel_size, centered)
+    estimate = cache.get(ob, "voxels_estimate", fingerprint)
+    if estimate is None:
+        with utils.get_evaluated_mesh(context, ob) as me:
+            verts = utils.get_verts_array(me, matrix=ob.matrix_world)
+            tris, _ = utils.get_triangles_arrays(me)
+        estimate = calc_voxels.calc_voxels_estimate(verts, tris, voxel_size, centered)
+        cache.put(ob, "voxels_estimate", fingerprint, estimate)
+    return estimate
+
+
+# Stored estimates, read by the panels while drawing
+
+_voxels_estimates = dict()  # ob pointer: estimate or error msg
+
+
+def update_voxels_estimate(context, ob):
+    """!
+    Calc, check and store the cost estimate of the Object voxelization.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    """
+    try:
+        estimate = get_voxels_estimate(context, ob)
+        calc_voxels.check_voxels_estimate(ob, estimate)
+    except BFException as err:
+        estimate = err.msg
+    _voxels_estimates[ob.as_pointer()] = estimate
+
+
+def rm_voxels_estimate(ob=None):
+    """!
+    Remove the stored cost estimate of the Object voxelization.
+    @param ob: the Blender object, if None remove all estimates.
+    """
+    if ob is None:
+        _voxels_estimates.clear()
+    else:
+        _voxels_estimates.pop(ob.as_pointer(), None)
+
+
+def get_stored_voxels_estimate(ob) -> "estimate, error msg, or None":
+    """!
+    Get the stored cost estimate of the Object voxelization, never calc it.
+    @param ob: the Blender object.
+    @return the estimate, its error message, or None if not stored.
+    """
+    return _voxels_estimates.get(ob.as_pointer())
+
+
 def _ob_to_xbs_pixels(
     context, ob, scale_length
 ) -> "((x0,x1,y0,y1,z0,z0,), ...), 'Msg'":
@@ -111,6 +368,48 @@ def _ob_to_xbs_bbox(context, ob, scale_length) -> "((x0,x1,y0,y1,z0,z1,), ...),
     return xbs, msg
 
 
+def _get_xbs_faces_arrays(context, ob, scale_length) -> "verts, loop_starts, loop_verts":
+    """!
+    Get Object evaluated mesh arrays for xbs notation (faces).
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @param scale_length: the scale to use.
+    @return vertices in world coordinates, polygons loop starts and vertex indices.
+    """
+    with utils.get_evaluated_mesh(context, ob) as me:
+        verts = utils.get_verts_array(me, ob.matrix_world, scale_length)
+        loop_starts, loop_verts, _ = utils.get_polygons_arrays(me)
+    return verts, loop_starts, loop_verts
+
+
+def _calc_xbs_faces(verts, loop_starts, loop_verts) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
+    """!
+    Transform mesh arrays flat faces to xbs notation (faces).
+    @param verts: the vertices coordinates.
+    @param loop_starts: the polygons loop starts.
+    @param loop_verts: the polygons vertex indices.
+    @return xbs notation (faces) and message.
+    """
+    if not len(loop_starts):
+        return list(), "XB: 0 faces"
+    # Min and max of each polygon, in loop starts order
+    order = np.argsort(loop_starts, kind="stable")
+    unorder = np.argsort(order)
+    coos = verts[loop_verts]
+    mins = np.minimum.reduceat(coos, loop_starts[order], axis=0)[unorder]
+    maxs = np.maximum.reduceat(coos, loop_starts[order], axis=0)[unorder]
+    # Flatten faces along the axis of min delta, z first on ties
+    flat_axis = 2 - np.argmin((maxs - mins)[:, ::-1], axis=1)
+    rows = np.arange(len(mins))
+    mids = (mins[rows, flat_axis] + maxs[rows, flat_axis]) / 2.0
+    mins[rows, flat_axis] = maxs[rows, flat_axis] = mids
+    xbs = np.empty((len(mins), 6))
+    xbs[:, 0::2], xbs[:, 1::2] = mins, maxs
+    xbs = list(map(tuple, xbs.tolist()))
+    xbs.sort()
+    return xbs, f"XB: {len(xbs)} faces"
+
+
 def _ob_to_xbs_faces(context, ob, scale_length) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
     """!
     Transform Object flat faces to xbs notation (faces).
@@ -119,39 +418,40 @@ def _ob_to_xbs_faces(context, ob, scale_length) -> "((x0,x1,y0,y1,z0,z1,), ...),
     @param scale_length: the scale to use.
     @return xbs notation (faces) and any error message.
     """
-    xbs = list()
-    bm = utils.get_object_bmesh(context, ob, world=True)
-    bm.faces.ensure_lookup_table()
-    for face in bm.faces:
-        verts = face.verts
-        xs, ys, zs = tuple(zip(*(v.co for v in verts)))
-        x0, x1, y0, y1, z0, z1 = (min(xs), max(xs), min(ys), max(ys), min(zs), max(zs))
-        deltas = [(x1 - x0, 2), (y1 - y0, 1), (z1 - z0, 0)]
-        deltas.sort()
-        if deltas[0][1] == 2:
-            x1 = x0 = (x0 + x1) / 2.0
-        if deltas[0][1] == 1:
-            y1 = y0 = (y0 + y1) / 2.0
-        if deltas[0][1] == 0:
-            z1 = z0 = (z0 + z1) / 2.0
-        xbs.append(
-            (
-                x0 * scale_length,
-                x1 * scale_length,
-                y0 * scale_length,
-                y1 * scale_length,
-                z0 * scale_length,
-                z1 * scale_length,
-            )
-        )
-    bm.free()
-    xbs.sort()
+    xbs, msg = _calc_xbs_faces(*_get_xbs_faces_arrays(context, ob, scale_length))
     if not xbs:
         raise BFException(ob, "XB: No exported faces!")
-    msg = f"XB: {len(xbs)} faces"
     return xbs, msg
 
 
+def _get_xbs_edges_arrays(context, ob, scale_length) -> "verts, edges":
+    """!
+    Get Object evaluated mesh arrays for xbs notation (edges).
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @param scale_length: the scale to use.
+    @return vertices in world coordinates, edges vertex indices.
+    """
+    with utils.get_evaluated_mesh(context, ob) as me:
+        verts = utils.get_verts_array(me, ob.matrix_world, scale_length)
+        edges = utils.get_edges_array(me)
+    return verts, edges
+
+
+def _calc_xbs_edges(verts, edges) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
+    """!
+    Transform mesh arrays edges to xbs notation (edges).
+    @param verts: the vertices coordinates.
+    @param edges: the edges vertex indices.
+    @return xbs notation (edges) and message.
+    """
+    xbs = np.empty((len(edges), 6))
+    xbs[:, 0::2], xbs[:, 1::2] = verts[edges[:, 0]], verts[edges[:, 1]]
+    xbs = list(map(tuple, xbs.tolist()))
+    xbs.sort()
+    return xbs, f"XB: {len(xbs)} edges"
+
+
 def _ob_to_xbs_edges(context, ob, scale_length) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
     """!
     Transform Object edges in xbs notation (edges).
@@ -160,27 +460,9 @@ def _ob_to_xbs_edges(context, ob, scale_length) -> "((x0,x1,y0,y1,z0,z1,), ...),
     @param scale_length: the scale to use.
     @return xbs notation (edges) and any error message.
     """
-    xbs = list()
-    bm = utils.get_object_bmesh(context, ob, world=True)
-    bm.edges.ensure_lookup_table()
-    for edge in bm.edges:
-        pt0x, pt0y, pt0z = edge.verts[0].co
-        pt1x, pt1y, pt1z = edge.verts[1].co
-        xbs.append(
-            (
-                pt0x * scale_length,
-                pt1x * scale_length,
-                pt0y * scale_length,
-                pt1y * scale_length,
-                pt0z * scale_length,
-                pt1z * scale_length,
-            )
-        )
-    bm.free()
-    xbs.sort()
+    xbs, msg = _calc_xbs_edges(*_get_xbs_edges_arrays(context, ob, scale_length))
     if not xbs:
         raise BFException(ob, "XB: No exported edges!")
-    msg = f"XB: {len(xbs)} edges"
     return xbs, msg
 
 
@@ -193,6 +475,74 @@ _choice_to_xbs = {
 }
 
 
+def _get_xbs_translation_step(context, ob) -> "float or None":
+    """!
+    Get the translation step that moves the xbs of an object without recalc.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @return 0. for any translation, the voxel size for its multiples, or None.
+    """
+    if ob.bf_xb in ("BBOX", "FACES", "EDGES"):
+        return 0.0
+    if ob.bf_xb == "VOXELS":
+        if ob.bf_xb_snap_to_mesh:  # voxels are aligned to the MESH cells
+            return None
+        if ob.bf_xb_center_voxels:  # voxels are aligned to the object
+            return 0.0
+        return calc_voxels.get_voxel_size(context, ob)  # aligned to world origin
+
+
+def _translate_xbs(result, translation, step, scale_length):
+    """!
+    Translate cached xbs to a new object translation, if allowed by step.
+    @param result: the cached (xbs, msg, translation).
+    @param translation: the new object translation.
+    @param step: the allowed translation step, see _get_xbs_translation_step().
+    @param scale_length: the scale to use.
+    @return the translated xbs and msg, or None if not allowed.
+    """
+    xbs, msg, translation0 = result
+    delta = tuple(t - t0 for t, t0 in zip(translation, translation0))
+    if not any(delta):
+        return xbs, msg
+    if step is None:
+        return
+    if step and any(abs(d / step - round(d / step)) > 1e-6 for d in delta):
+        return
+    dx, dy, dz = (d * scale_length for d in delta)
+    xbs = [
+        (x0 + dx, x1 + dx, y0 + dy, y1 + dy, z0 + dz, z1 + dz)
+        for x0, x1, y0, y1, z0, z1 in xbs
+    ]
+    return xbs, msg
+
+
+def _get_xbs_fingerprint(context, ob, scale_length) -> "fingerprint, step, voxels":
+    """!
+    Return the fingerprint of the xbs cache entry of an object.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @param scale_length: the scale to use.
+    @return the fingerprint, the translation step, and the voxel parameters or None.
+    """
+    step = _get_xbs_translation_step(context, ob)
+    if ob.bf_xb in ("VOXELS", "PIXELS"):
+        voxels = calc_voxels.get_voxel_size(context, ob), ob.bf_xb_center_voxels
+        if ob.bf_xb == "VOXELS" and ob.bf_xb_snap_to_mesh:
+            voxels += (calc_voxels.get_mesh_grids(context),)
+    else:
+        voxels = None
+    fingerprint = _get_fingerprint(
+        context,
+        ob,
+        scale_length,
+        ob.bf_xb,
+        voxels,
+        _get_matrix(ob, translation=step is None),
+    )
+    return fingerprint, step, voxels
+
+
 def ob_to_xbs(context, ob, scale_length) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
     """!
     Transform Object geometry according to ob.bf_xb (None, BBOX, VOXELS, FACES, PIXELS, EDGES) to FDS notation.
@@ -202,15 +552,83 @@ def ob_to_xbs(context, ob, scale_length) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'"
     @return the FDS notation and any error message.
     """
     log.debug(ob.name)
-    if ob.get("ob_to_xbs_cache") is None:  # recalc
-        log.debug(f"Update <{ob.name}> xbs cache")
-        ob["ob_to_xbs_cache"] = _choice_to_xbs[ob.bf_xb](context, ob, scale_length)
-    return ob["ob_to_xbs_cache"]
+    fingerprint, step, voxels = _get_xbs_fingerprint(context, ob, scale_length)
+    translation = tuple(ob.matrix_world.translation)
+    result = cache.get(ob, "xbs", fingerprint)
+    if result is None and voxels:  # expensive, try the disk
+        result = _load_xbs(key=fingerprint[1:])
+        if result is not None:
+            cache.put(ob, "xbs", fingerprint, result)
+    if result is not None:  # reuse, translated if needed
+        xbs_msg = _translate_xbs(result, translation, step, scale_length)
+        if xbs_msg is not None:
+            if xbs_msg[0] is not result[0]:
+                cache.put(ob, "xbs", fingerprint, (*xbs_msg, translation))
+            return xbs_msg
+    log.debug(f"Update <{ob.name}> xbs cache")
+    xbs, msg = _choice_to_xbs[ob.bf_xb](context, ob, scale_length)
+    if voxels:
+        _save_xbs(key=fingerprint[1:], result=(xbs, msg, translation))
+    cache.put(ob, "xbs", fingerprint, (xbs, msg, translation))
+    return xbs, msg
+
+
+def _load_xbs(key):
+    """!
+    Load xbs notation from the on-disk cache.
+    @param key: the cache fingerprint without the object name.
+    @return the xbs, message and object translation, or None if missing.
+    """
+    data = cache.load("xbs", key)
+    if data is None:
+        return None
+    xbs = list(map(tuple, data["xbs"].tolist()))
+    return xbs, str(data["msg"]), tuple(data["translation"].tolist())
+
+
+def _save_xbs(key, result):
+    """!
+    Save xbs notation to the on-disk cache.
+    @param key: the cache fingerprint without the object name.
+    @param result: the xbs, message and object translation.
+    """
+    xbs, msg, translation = result
+    cache.save(
+        "xbs",
+        key,
+        xbs=np.array(xbs, dtype=np.float64).reshape(-1, 6),
+        msg=msg,
+        translation=np.array(translation, dtype=np.float64),
+    )
 
 
 # to XYZ in Blender units
 
 
+def _get_xyzs_vertices_arrays(context, ob, scale_length) -> "verts,":
+    """!
+    Get Object evaluated mesh arrays for xyzs notation.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @param scale_length: the scale to use.
+    @return vertices in world coordinates.
+    """
+    with utils.get_evaluated_mesh(context, ob) as me:
+        verts = utils.get_verts_array(me, ob.matrix_world, scale_length)
+    return (verts,)
+
+
+def _calc_xyzs_vertices(verts) -> "((x0,y0,z0,), ...), 'Msg'":
+    """!
+    Transform mesh arrays vertices to xyzs notation.
+    @param verts: the vertices coordinates.
+    @return the xyzs notation and message.
+    """
+    xyzs = list(map(tuple, verts.tolist()))
+    xyzs.sort()
+    return xyzs, f"XYZ: {len(xyzs)} vertices"
+
+
 def _ob_to_xyzs_vertices(context, ob, scale_length) -> "((x0,y0,z0,), ...), 'Msg'":
     """!
     Transform Object vertices to xyzs notation.
@@ -219,18 +637,11 @@ def _ob_to_xyzs_vertices(context, ob, scale_length) -> "((x0,y0,z0,), ...), 'Msg
     @param scale_length: the scale to use.
     @return the xyzs notation and any error message.
     """
-    xyzs = list()
-    bm = utils.get_object_bmesh(context, ob, world=True)
-    # For each vertex...
-    bm.verts.ensure_lookup_table()
-    for v in bm.verts:
-        pt0x, pt0y, pt0z = v.co
-        xyzs.append((pt0x * scale_length, pt0y * scale_length, pt0z * scale_length))
-    bm.free()
-    xyzs.sort()
+    xyzs, msg = _calc_xyzs_vertices(
+        *_get_xyzs_vertices_arrays(context, ob, scale_length)
+    )
     if not xyzs:
         raise BFException(ob, "XYZ: No exported vertices!")
-    msg = f"XYZ: {len(xyzs)} vertices"
     return xyzs, msg
 
 
@@ -256,6 +667,19 @@ def _ob_to_xyzs_center(context, ob, scale_length) -> "((x0,y0,z0,), ...), 'Msg'"
 _choice_to_xyzs = {"CENTER": _ob_to_xyzs_center, "VERTICES": _ob_to_xyzs_vertices}
 
 
+def _get_xyzs_fingerprint(context, ob, scale_length) -> "tuple":
+    """!
+    Return the fingerprint of the xyzs cache entry of an object.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @param scale_length: the scale to use.
+    @return the fingerprint.
+    """
+    if ob.bf_xyz == "CENTER":
+        return ob.name, scale_length, ob.bf_xyz, tuple(ob.location)
+    return _get_fingerprint(context, ob, scale_length, ob.bf_xyz, _get_matrix(ob))
+
+
 def ob_to_xyzs(context, ob, scale_length) -> "((x0,y0,z0,), ...), 'Msg'":
     """!
     Transform Object geometry according to ob.bf_xyz (None, CENTER, VERTICES) to xyzs notation.
@@ -265,10 +689,13 @@ def ob_to_xyzs(context, ob, scale_length) -> "((x0,y0,z0,), ...), 'Msg'":
     @return the xyzs notation and any error message.
     """
     log.debug(ob.name)
-    if ob.get("ob_to_xyzs_cache") is None:  # recalc
+    fingerprint = _get_xyzs_fingerprint(context, ob, scale_length)
+    result = cache.get(ob, "xyzs", fingerprint)
+    if result is None:  # recalc
         log.debug(f"Update <{ob.name}> xyzs cache")
-        ob["ob_to_xyzs_cache"] = _choice_to_xyzs[ob.bf_xyz](context, ob, scale_length)
-    return ob["ob_to_xyzs_cache"]
+        result = _choice_to_xyzs[ob.bf_xyz](context, ob, scale_length)
+        cache.put(ob, "xyzs", fingerprint, result)
+    return result
 
 
 # to PB in Blender units
@@ -315,7 +742,209 @@ def ob_to_pbs(context, ob, scale_length) -> "((0,x3,), (1,x7,), (1,y9,), ...), '
     @return the pbs notation and any error message.
     """
     log.debug(ob.name)
-    if ob.get("ob_to_pbs_cache") is None:  # recalc
+    fingerprint = _get_fingerprint(context, ob, scale_length, _get_matrix(ob))
+    result = cache.get(ob, "pbs", fingerprint)
+    if result is None:  # recalc
         log.debug(f"Update <{ob.name}> pbs cache")
-        ob["ob_to_pbs_cache"] = _ob_to_pbs_planes(context, ob, scale_length)
-    return ob["ob_to_pbs_cache"]  # the cache sends floats instead of integers for axis
+        result = _ob_to_pbs_planes(context, ob, scale_length)
+        cache.put(ob, "pbs", fingerprint, result)
+    return result
+
+
+# Union voxels
+
+
+def _get_union_fingerprint(context, obs, scale_length) -> "kind, fingerprint":
+    """!
+    Return the kind and fingerprint of the union xbs cache entry of Objects.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param obs: the Blender objects.
+    @param scale_length: the scale to use.
+    @return the cache entry kind, the fingerprint.
+    """
+    fingerprint = (
+        scale_length,
+        calc_voxels.get_voxel_size(context, obs[0]),
+        tuple(_get_fingerprint(context, ob, _get_matrix(ob)) for ob in obs),
+    )
+    return f"union_xbs {obs[0].name}", fingerprint
+
+
+def _get_union_arrays(
+    context, obs, scale_length
+) -> "names, meshes, voxel_size, scale_length, dt":
+    """!
+    Get Objects evaluated mesh arrays for union xbs notation (voxelization).
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param obs: the Blender objects, with the same voxel size.
+    @param scale_length: the scale to use.
+    @return the names of the non empty Objects, their (verts, tris) in world coo, the voxelization parameters, and the time spent.
+    """
+    t0 = time()
+    names, meshes = list(), list()
+    for ob in obs:
+        with utils.get_evaluated_mesh(context, ob) as me:
+            verts = utils.get_verts_array(me, matrix=ob.matrix_world)
+            tris, _ = utils.get_triangles_arrays(me)
+        if len(tris):  # empty ones are exported alone, and fail there
+            names.append(ob.name)
+            meshes.append((verts, tris))
+    voxel_size = calc_voxels.get_voxel_size(context, obs[0])
+    return names, meshes, voxel_size, scale_length, time() - t0
+
+
+def _calc_union_xbs(
+    names, meshes, voxel_size, scale_length, dt=0.0
+) -> "((names, xbs, sources, 'Msg'), ...)":
+    """!
+    Transform the solid geometry of meshes to union xbs notation (voxelization).
+    @param names: the Object names of the meshes.
+    @param meshes: the (verts, tris) of each Object in world coo.
+    @param voxel_size: the voxel size.
+    @param scale_length: the scale to use.
+    @param dt: the time spent getting the arrays.
+    @return the Object names of each union, its xbs, the Object names of each xb, and any message.
+    """
+    t0 = time()
+    unions = calc_voxels.calc_union_voxels(meshes, voxel_size, scale_length)
+    dt += time() - t0
+    res = voxel_size * scale_length
+    result = list()
+    for indices, xbs, sources in unions:
+        msg = (
+            f"XB: {len(xbs)} voxels of {len(indices)} objects, "
+            f"resolution {res:.3f} m, in {dt:.3f} s"
+        )
+        result.append(
+            (
+                tuple(names[i] for i in indices),
+                tuple(xbs),
+                tuple(tuple(names[i] for i in source) for source in sources),
+                msg,
+            )
+        )
+    return tuple(result)
+
+
+def obs_to_union_xbs(
+    context, obs, scale_length
+) -> "[(names, xbs, sources, 'Msg'), ...]":
+    """!
+    Transform the solid geometry of Objects to union xbs notation (voxelization).
+    Only touching or overlapping Objects are joined, the others are not returned.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param obs: the Blender objects, with the same voxel size and aligned to world origin.
+    @param scale_length: the scale to use.
+    @return the Object names of each union, its xbs, the Object names of each xb, and any message.
+    """
+    sc = context.scene
+    kind, fingerprint = _get_union_fingerprint(context, obs, scale_length)
+    result = cache.get(sc, kind, fingerprint)
+    if result is None:  # recalc
+        log.debug(f"Update <{sc.name}> {kind} cache")
+        result = _calc_union_xbs(*_get_union_arrays(context, obs, scale_length))
+        result = cache.put(sc, kind, fingerprint, result)
+    return result
+
+
+# Parallel prefetch
+
+# The evaluated meshes are extracted to arrays in this process, as bpy is not
+# available to workers, then the expensive pure data work is sent to a process
+# pool: voxelizations and GEOM notation. Results fill the caches, so the
+# following serial export only reads them.
+
+
+def prefetch(context, obs, processes, unions=None):
+    """!
+    Calc the missing expensive geometric caches in parallel, in worker processes.
+    Errors are not reported, the serial export recalcs and raises them.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param obs: the Blender objects.
+    @param processes: number of processes.
+    @param unions: the lists of Blender objects voxelized together, see obs_to_union_xbs().
+    """
+    sc = context.scene
+    scale_length = sc.unit_settings.scale_length
+    jobs = list()  # (owner, kind, fingerprint, get_arrays, calc, translation, save)
+    for ob in obs:
+        if ob.bf_is_tmp or ob.type != "MESH" or ob.hide_render:
+            continue
+        if ob.bf_namelist_cls == "ON_GEOM":
+            check, world = ob.bf_geom_check_sanity, not ob.bf_move_id
+            fingerprint = _get_geom_fingerprint(context, ob, scale_length, check, world)
+            if cache.get(ob, "geom", fingerprint) is not None:
+                continue
+            try:
+                result = _load_geom(ob, key=fingerprint[1:])
+            except BFException:  # cached error
+                continue
+            if result is not None:
+                cache.put(ob, "geom", fingerprint, result)
+                continue
+            get_arrays = partial(
+                _get_geom_arrays, context, ob, scale_length, check, world
+            )
+            jobs.append(
+                (ob, "geom", fingerprint, get_arrays, _calc_geom, None, _save_geom)
+            )
+        elif (
+            ob.bf_xb_export
+            and ob.bf_namelist.bf_param_xb
+            and ob.bf_xb == "VOXELS"
+            and not ob.bf_xb_snap_to_mesh
+        ):
+            fingerprint, _, _ = _get_xbs_fingerprint(context, ob, scale_length)
+            if cache.get(ob, "xbs", fingerprint) is not None:
+                continue
+            result = _load_xbs(key=fingerprint[1:])
+            if result is not None:
+                cache.put(ob, "xbs", fingerprint, result)
+                continue
+            translation = tuple(ob.matrix_world.translation)
+            get_arrays = partial(_get_xbs_voxels_arrays, context, ob, scale_length)
+            jobs.append(
+                (
+                    ob,
+                    "xbs",
+                    fingerprint,
+                    get_arrays,
+                    _calc_xbs_voxels,
+                    translation,
+                    _save_xbs,
+                )
+            )
+    for union_obs in unions or tuple():
+        kind, fingerprint = _get_union_fingerprint(context, union_obs, scale_length)
+        if cache.get(sc, kind, fingerprint) is None:
+            get_arrays = partial(_get_union_arrays, context, union_obs, scale_length)
+            jobs.append(
+                (sc, kind, fingerprint, get_arrays, _calc_union_xbs, None, None)
+            )
+    if len(jobs) < 2:
+        return
+    pool = get_process_pool(processes)
+    if pool is None:  # not available
+        return
+    log.debug(f"Prefetch {len(jobs)} geometric caches")
+    with pool:
+        futures = list()
+        for job in jobs:
+            try:
+                args = job[3]()
+            except BFException:  # eg. sanity check failed
+                futures.append(None)
+            else:
+                futures.append(pool.submit(job[4], *args))
+        for job, future in zip(jobs, futures):
+            if future is None:
+                continue
+            owner, kind, fingerprint, _, _, translation, save = job
+            result = future.result()
+            if translation is not None:
+                if not result[0]:  # no voxel created, error
+                    continue
+                result = (*result, translation)
+            if save is not None:
+                save(key=fingerprint[1:], result=result)
+            cache.put(owner, kind, fingerprint, result)
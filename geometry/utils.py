@@ -3,8 +3,12 @@ BlenderFDS, geometric utilities.
 """
 
 import bpy, bmesh
+from contextlib import contextmanager
+
+import numpy as np
 
 from ..types import BFException
+from . import cache
 
 
 # Working on Blender objects
@@ -45,6 +49,87 @@ def get_object_bmesh(
     return bm
 
 
+# Working on mesh arrays
+
+# Evaluated mesh data is read in bulk with foreach_get into numpy arrays,
+# instead of looping over bmesh elements.
+
+
+@contextmanager
+def get_evaluated_mesh(context, ob) -> "Mesh":
+    """!
+    Get the evaluated object mesh (eg. modifiers applied), to be used as context manager.
+    @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+    @param ob: the Blender object.
+    @return the evaluated tmp mesh, removed on exit.
+    """
+    if ob.type not in {"MESH", "CURVE", "SURFACE", "FONT", "META"}:
+        raise BFException(ob, "Object cannnot be converted into mesh")
+    ob_eval = ob.evaluated_get(context.evaluated_depsgraph_get())
+    me = ob_eval.to_mesh()
+    try:
+        yield me
+    finally:
+        ob_eval.to_mesh_clear()
+
+
+def get_verts_array(me, matrix=None, scale_length=1.0) -> "array (n, 3)":
+    """!
+    Get mesh vertices coordinates, transformed and scaled.
+    @param me: the Blender mesh.
+    @param matrix: the transformation matrix, eg. ob.matrix_world, or None.
+    @param scale_length: the scale to use.
+    @return the coordinates as float64 array of shape (n, 3).
+    """
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3).astype(np.float64)
+    m = np.identity(4) if matrix is None else np.array(matrix, dtype=np.float64)
+    m[:3] *= scale_length  # transform and scale in one multiply
+    return co @ m[:3, :3].T + m[:3, 3]
+
+
+def get_edges_array(me) -> "array (n, 2)":
+    """!
+    Get mesh edges vertex indices.
+    @param me: the Blender mesh.
+    @return the vertex indices as int array of shape (n, 2).
+    """
+    edges = np.empty(len(me.edges) * 2, dtype=np.int32)
+    me.edges.foreach_get("vertices", edges)
+    return edges.reshape(-1, 2)
+
+
+def get_polygons_arrays(me) -> "loop_starts, loop_verts, material_indices":
+    """!
+    Get mesh polygons vertex indices and material indices.
+    The vertex indices of polygon i start at loop_verts[loop_starts[i]].
+    @param me: the Blender mesh.
+    @return the polygons loop starts, the loops vertex indices, the polygons material indices.
+    """
+    loop_starts = np.empty(len(me.polygons), dtype=np.int32)
+    me.polygons.foreach_get("loop_start", loop_starts)
+    loop_verts = np.empty(len(me.loops), dtype=np.int32)
+    me.loops.foreach_get("vertex_index", loop_verts)
+    material_indices = np.empty(len(me.polygons), dtype=np.int32)
+    me.polygons.foreach_get("material_index", material_indices)
+    return loop_starts, loop_verts, material_indices
+
+
+def get_triangles_arrays(me) -> "tris, material_indices":
+    """!
+    Get mesh loop triangles vertex indices and material indices.
+    @param me: the Blender mesh.
+    @return the vertex indices as int array of shape (n, 3), the material indices.
+    """
+    me.calc_loop_triangles()
+    tris = np.empty(len(me.loop_triangles) * 3, dtype=np.int32)
+    me.loop_triangles.foreach_get("vertices", tris)
+    material_indices = np.empty(len(me.loop_triangles), dtype=np.int32)
+    me.loop_triangles.foreach_get("material_index", material_indices)
+    return tris.reshape(-1, 3), material_indices
+
+
 def get_tmp_object(context, ob, name="tmp"):
     """!
     Get a new tmp Object from ob.
@@ -83,24 +168,33 @@ def rm_tmp_objects():
 
 def rm_geometric_cache(ob):
     """!
-    Remove geometric caches for XB, XYZ, PB*, GEOM from object
+    Remove geometric caches for XB, XYZ, PB*, GEOM, and the dependent FDS text cache from object
     @param ob: Blender Object.
     """
-    ob["ob_to_geom_cache"] = None
-    ob["ob_to_xbs_cache"] = None
-    ob["ob_to_xyzs_cache"] = None
-    ob["ob_to_pbs_cache"] = None
+    cache.rm(ob)
+    cache.rm_mesh_hash(ob)
 
 
 def rm_geometric_caches():
     """!
-    Remove geometric caches for XB, XYZ, PB*, GEOM from all objects in bpy.data
+    Remove geometric caches for XB, XYZ, PB*, GEOM, and FDS text from all objects
+    """
+    cache.rm_all()
+
+
+def rm_legacy_geometric_caches():
+    """!
+    Remove the geometric caches saved as ID properties by older versions from all objects in bpy.data
     """
     for ob in bpy.data.objects:
-        ob["ob_to_geom_cache"] = None
-        ob["ob_to_xbs_cache"] = None
-        ob["ob_to_xyzs_cache"] = None
-        ob["ob_to_pbs_cache"] = None
+        for key in (
+            "ob_to_geom_cache",
+            "ob_to_xbs_cache",
+            "ob_to_xyzs_cache",
+            "ob_to_pbs_cache",
+        ):
+            if key in ob:
+                del ob[key]
 
 
 # Working on Blender materials
@@ -152,20 +246,12 @@ def get_bbox_xbs(context, ob, scale_length, world=False) -> "x0, x1, y0, y1, z0,
     @return the object’s bounding box.
     """
     if world:
-        bm = get_object_bmesh(context, ob, world=True)
-        bm.verts.ensure_lookup_table()
-        if not bm.verts:
+        with get_evaluated_mesh(context, ob) as me:
+            verts = get_verts_array(me, ob.matrix_world, scale_length)
+        if not len(verts):
             raise BFException(ob, "No exported geometry!")
-        xs, ys, zs = tuple(zip(*(v.co for v in bm.verts)))
-        bm.free()
-        return (
-            min(xs) * scale_length,
-            max(xs) * scale_length,
-            min(ys) * scale_length,
-            max(ys) * scale_length,
-            min(zs) * scale_length,
-            max(zs) * scale_length,
-        )
+        (x0, y0, z0), (x1, y1, z1) = verts.min(axis=0), verts.max(axis=0)
+        return float(x0), float(x1), float(y0), float(y1), float(z0), float(z1)
     else:
         bb = ob.bound_box  # needs updated view_layer
         return (
@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import re, os.path, time, sys, logging
+import re, io, os.path, time, sys, logging
 from collections import OrderedDict
 
 import bpy, bmesh
@@ -29,6 +29,8 @@ from bpy.types import (
     Scene,
     Material,
     Collection,
+    ID,
+    bpy_prop_collection,
 )
 from bpy.props import (
     BoolProperty,
@@ -483,6 +485,20 @@ class SP_config_default_voxel_size(BFParam):
     bpy_other = {"unit": "LENGTH", "step": 1.0, "precision": 3}
 
 
+@subscribe
+class SP_config_union_voxels(BFParam):
+    """!
+    Blender representation to voxelize together the OBST objects with the same SURF_ID.
+    """
+
+    label = "Union Voxels"
+    description = "Voxelize together touching OBST objects with the same SURF_ID,\nvoxel size and other parameters, and merge their voxels"
+    bpy_type = Scene
+    bpy_idname = "bf_config_union_voxels"
+    bpy_prop = BoolProperty
+    bpy_default = False
+
+
 @subscribe
 class SN_config_sizes(BFNamelistSc):
     """!
@@ -494,6 +510,7 @@ class SN_config_sizes(BFNamelistSc):
         SP_config_min_edge_length,
         SP_config_min_face_area,
         SP_config_default_voxel_size,
+        SP_config_union_voxels,
     )
 
 
@@ -1617,8 +1634,7 @@ class OP_FYI(BFParamFYI):
 
 
 def update_bf_xb(ob, context):
-    # Remove cache and tmp objects
-    ob["ob_to_xbs_cache"] = None
+    # Remove tmp objects, stale caches are detected by their fingerprint
     geometry.utils.rm_tmp_objects()
     # Prevent double multiparam
     if ob.bf_xb in ("VOXELS", "FACES", "PIXELS", "EDGES") and ob.bf_xb_export:
@@ -1682,6 +1698,21 @@ class OP_XB_center_voxels(BFParam):
     bpy_other = {"update": update_bf_xb}
 
 
+@subscribe
+class OP_XB_snap_to_mesh(BFParam):
+    """!
+    Blender representation to snap voxels to the cells of the overlapping MESH objects.
+    """
+
+    label = "Snap Voxels to MESH"
+    description = "Voxelize on the cell grids of the overlapping MESH objects,\nas resolved by FDS, ignoring voxel size and centering"
+    bpy_type = Object
+    bpy_idname = "bf_xb_snap_to_mesh"
+    bpy_prop = BoolProperty
+    bpy_default = False
+    bpy_other = {"update": update_bf_xb}
+
+
 @subscribe
 class OP_XB_export(BFParam):
     """!
@@ -1725,9 +1756,31 @@ class OP_XB(BFParamXB):
     def draw(self, context, layout):
         super().draw(context, layout)
         ob = self.element
+        if ob.bf_xb_export and ob.bf_xb == "VOXELS":
+            OP_XB_snap_to_mesh(ob).draw(context, layout)
         if ob.bf_xb_export and ob.bf_xb in ("VOXELS", "PIXELS"):
             OP_XB_center_voxels(ob).draw(context, layout)
             OP_XB_voxel_size(ob).draw(context, layout)
+        if ob.bf_xb_export and ob.bf_xb == "VOXELS" and not ob.bf_xb_snap_to_mesh:
+            self._draw_voxels_estimate(context, layout)
+
+    def _draw_voxels_estimate(self, context, layout):
+        """!
+        Draw the stored voxelization cost estimate, see handlers.
+        @param context: the <a href="https://docs.blender.org/api/current/bpy.context.html">blender context</a>.
+        @param layout: the Blender panel layout.
+        """
+        estimate = geometry.to_fds.get_stored_voxels_estimate(self.element)
+        if estimate is None:  # not stored yet, eg. in edit mode
+            layout.operator("object.bf_voxels_estimate")
+            return
+        if isinstance(estimate, str):  # error msg
+            layout.label(text=estimate, icon="ERROR")
+            return
+        _, nvoxels, nxbs, memory, runtime = estimate
+        layout.label(
+            text=f"Estimate: ~{nvoxels} voxels, ~{nxbs} XB, {memory / 2**20:.0f} MB, ~{runtime:.1f} s"
+        )
 
     def to_fds_param(self, context):
         ob = self.element
@@ -1837,8 +1890,7 @@ class OP_XB_BBOX(OP_XB):
 
 
 def update_bf_xyz(ob, context):
-    # Remove cache and tmp objects
-    ob["ob_to_xyzs_cache"] = None
+    # Remove tmp objects, stale caches are detected by their fingerprint
     geometry.utils.rm_tmp_objects()
     # Prevent double multiparam
     if ob.bf_xyz == "VERTICES" and ob.bf_xyz_export:
@@ -1956,8 +2008,7 @@ class OP_XYZ_center(OP_XYZ):
 
 
 def update_bf_pb(ob, context):
-    # Remove cache and tmp objects
-    ob["ob_to_pbs_cache"] = None
+    # Remove tmp objects, stale caches are detected by their fingerprint
     geometry.utils.rm_tmp_objects()
     # Prevent double multiparam
     if ob.bf_pb == "PLANES" and ob.bf_pb_export:
@@ -2362,7 +2413,7 @@ class OP_GEOM(BFParam):
             ob=self.element,
             scale_length=scale_length,
             check=check,
-            world=True,
+            world=world,
         )
         return (
             FDSParam(fds_label="SURF_ID", values=fds_surfids, msg=msg),
@@ -3008,11 +3059,33 @@ MP_namelist_cls.bpy_other["items"] = items
 # Extension of Blender types
 
 
+def _to_fingerprint_value(value):
+    """!
+    Return a repr-stable copy of a Blender property value, for fingerprints.
+    @param value: the Blender property value.
+    @return the value, ID name, or tuple of values.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, ID):
+        return value.name
+    if isinstance(value, (set, frozenset)):  # eg. enum flag sets
+        return tuple(sorted(value))
+    if isinstance(value, bpy_prop_collection):  # eg. bf_other items
+        return tuple((item.name, getattr(item, "bf_export", None)) for item in value)
+    try:
+        return tuple(value)  # eg. vector properties
+    except TypeError:
+        return repr(value)
+
+
 class BFObject:
     """!
     Extension of Blender Object.
     """
 
+    _bf_idnames = tuple()  # bf_* property names, set at registration
+
     @property
     def bf_namelist(self):
         """!
@@ -3026,6 +3099,58 @@ class BFObject:
                 "FDS namelist <{self.bf_namelist_cls}> not supported by Blender Object <{self.name}>",
             )
 
+    def get_fds_fingerprint(self, context) -> "tuple":
+        """!
+        Return the fingerprint of the state my FDS text depends on.
+        That is my bf_* properties, my materials SURF state, my geometry and transform,
+        and the scene units and sizes.
+        @param context: the Blender context.
+        @return the fingerprint.
+        """
+        sc = context.scene
+        key = [
+            self.name,
+            self.hide_render,
+            geometry.cache.get_mesh_hash(context, self),
+            tuple(v for row in self.matrix_world for v in row),
+            tuple(self.location),
+            self.active_material_index,
+            sc.unit_settings.scale_length,
+            sc.bf_default_voxel_size,
+            sc.bf_config_min_edge_length_export,
+            sc.bf_config_min_edge_length,
+            sc.bf_config_min_face_area_export,
+            sc.bf_config_min_face_area,
+        ]
+        if self.bf_xb == "VOXELS" and self.bf_xb_snap_to_mesh:  # MESH cells too
+            key.append(geometry.calc_voxels.get_mesh_grids(context))
+        key.extend(
+            (ms.material.name, ms.material.bf_surf_export) if ms.material else None
+            for ms in self.material_slots
+        )
+        key.extend(
+            _to_fingerprint_value(getattr(self, idname))
+            for idname in BFObject._bf_idnames
+        )
+        return tuple(key)
+
+    def get_fds_text(self, context) -> "str":
+        """!
+        Return the FDS formatted string, each namelist preceded by a newline.
+        The text is cached and reused until my fingerprint or my geometry cache change.
+        @param context: the Blender context.
+        @return FDS formatted string, empty if nothing is exported.
+        """
+        fingerprint = self.get_fds_fingerprint(context)
+        text = geometry.cache.get(self, "fds", fingerprint)
+        if text is None:  # recalc
+            log.debug(f"Update <{self.name}> fds cache")
+            fh = io.StringIO()
+            self.bf_namelist.to_fds_stream(context, fh)
+            text = fh.getvalue()
+            geometry.cache.put(self, "fds", fingerprint, text)
+        return text
+
     def to_fds(self, context):
         """!
         Return the FDS formatted string.
@@ -3034,7 +3159,17 @@ class BFObject:
         """
         if self.bf_is_tmp or not self.type == "MESH":
             return
-        return self.bf_namelist.to_fds(context)
+        return self.get_fds_text(context)[1:] or None  # remove first newline
+
+    def to_fds_stream(self, context, fh):
+        """!
+        Write the FDS formatted string to a file handle, each namelist preceded by a newline.
+        @param context: the Blender context.
+        @param fh: writable text file handle.
+        """
+        if self.bf_is_tmp or not self.type == "MESH":
+            return
+        fh.write(self.get_fds_text(context))
 
     def from_fds(self, context, fds_namelist):
         """!
@@ -3093,8 +3228,16 @@ class BFObject:
         Register related Blender properties.
         @param cls: class to be registered.
         """
+        cls._bf_idnames = tuple(
+            p.identifier
+            for p in Object.bl_rna.properties
+            if p.identifier.startswith("bf_")
+        )
         Object.bf_namelist = cls.bf_namelist
+        Object.get_fds_fingerprint = cls.get_fds_fingerprint
+        Object.get_fds_text = cls.get_fds_text
         Object.to_fds = cls.to_fds
+        Object.to_fds_stream = cls.to_fds_stream
         Object.from_fds = cls.from_fds
         Object.set_default_appearance = cls.set_default_appearance
 
@@ -3106,7 +3249,10 @@ class BFObject:
         """
         del Object.set_default_appearance
         del Object.from_fds
+        del Object.to_fds_stream
         del Object.to_fds
+        del Object.get_fds_text
+        del Object.get_fds_fingerprint
         del Object.bf_namelist
 
 
@@ -3136,6 +3282,14 @@ class BFMaterial:
         """
         return self.bf_namelist.to_fds(context)
 
+    def to_fds_stream(self, context, fh):
+        """!
+        Write the FDS formatted string to a file handle, each namelist preceded by a newline.
+        @param context: the Blender context.
+        @param fh: writable text file handle.
+        """
+        self.bf_namelist.to_fds_stream(context, fh)
+
     def from_fds(self, context, fds_namelist):
         """!
         Set self.bf_namelist from FDSNamelist, on error raise BFException.
@@ -3164,6 +3318,7 @@ class BFMaterial:
         """
         Material.bf_namelist = cls.bf_namelist
         Material.to_fds = cls.to_fds
+        Material.to_fds_stream = cls.to_fds_stream
         Material.from_fds = cls.from_fds
         Material.set_default_appearance = cls.set_default_appearance
 
@@ -3175,6 +3330,7 @@ class BFMaterial:
         """
         del Material.set_default_appearance
         del Material.from_fds
+        del Material.to_fds_stream
         del Material.to_fds
         del Material.bf_namelist
 
@@ -3198,6 +3354,18 @@ class BFScene:
         @param full: if True, return full FDS case.
         @return None or FDS formatted string, eg. "&OBST ID='Test' /".
         """
+        fh = io.StringIO()
+        self.to_fds_stream(context, fh, full=full)
+        return fh.getvalue()
+
+    def to_fds_stream(self, context, fh, full=False, processes=1):
+        """!
+        Write the FDS formatted string to a file handle, namelist by namelist.
+        @param context: the Blender context.
+        @param fh: writable text file handle.
+        @param full: if True, write full FDS case.
+        @param processes: number of processes calculating the geometry.
+        """
         # Header
         v = sys.modules[__package__].bl_info["version"]
         blv = bpy.app.version_string
@@ -3205,83 +3373,157 @@ class BFScene:
         filepath = bpy.data.filepath or "not saved"
         if len(filepath) > 60:
             filepath = "..." + filepath[-57:]
-        lines = list(
-            (
-                f"! Generated by BlenderFDS {v[0]}.{v[1]}.{v[2]} on Blender {blv}",
-                f"! File: <{filepath}>",
-                f"! Blender Scene: <{self.name}>",
-                f"! Date: <{now}>",
+        fh.write(
+            "\n".join(
+                (
+                    f"! Generated by BlenderFDS {v[0]}.{v[1]}.{v[2]} on Blender {blv}",
+                    f"! File: <{filepath}>",
+                    f"! Blender Scene: <{self.name}>",
+                    f"! Date: <{now}>",
+                )
             )
         )
-        # My namelists
-        lines.extend(
-            n.to_fds(context) for n in self.bf_namelists if n is not None
-        )  # protect from None
+        # My namelists, each one preceded by a newline
+        for n in self.bf_namelists:
+            if n is not None:  # protect from None
+                n.to_fds_stream(context, fh)
         # Free Text
         if self.bf_config_text:
-            lines.append(f"\n! --- From <{self.bf_config_text.name}> free text")
-            lines.append(self.bf_config_text.as_string())
+            fh.write(f"\n\n! --- From <{self.bf_config_text.name}> free text")
+            text = self.bf_config_text.as_string()
+            if text:
+                fh.write("\n")
+                fh.write(text)
         # Extend with Materials and Collections
         if full:
             # Materials
             mas = list(bpy.data.materials)
             if mas:
                 mas.sort(key=lambda k: k.name)  # alphabetic order by name
-                lines.append("\n! --- Boundary conditions from Blender Materials")
+                fh.write("\n\n! --- Boundary conditions from Blender Materials")
                 for ma in mas:
-                    lines.append(ma.to_fds(context))
-            # Objects
-            lines.append(self.collection.to_fds(context))
+                    ma.to_fds_stream(context, fh)
+            # Objects, some of them as union voxels
+            groups = list()
+            if self.bf_config_union_voxels:
+                groups = self._get_union_voxels_groups(context)
+            if processes > 1:  # calc geometry of all objects in parallel first
+                grouped = {ob.name for obs in groups for ob in obs}
+                obs = [
+                    ob for ob in self.collection.all_objects if ob.name not in grouped
+                ]
+                geometry.to_fds.prefetch(context, obs, processes, unions=groups)
+            names, namelists = self._get_union_voxels_namelists(context, groups)
+            self.collection.to_fds_stream(context, fh, exclude=names)
+            if namelists:
+                fh.write("\n\n! --- Union voxels from Blender Objects by SURF_ID")
+                for namelist in namelists:
+                    fh.write("\n")
+                    namelist.to_fds_stream(fh)
             # Tail
             if self.bf_head_export:
-                lines.append("\n&TAIL /")
-        return "\n".join(line for line in lines if line)  # remove empties
+                fh.write("\n\n&TAIL /")
+
+    def _get_union_voxels_groups(self, context) -> "[[ob, ...], ...]":
+        """!
+        Get the voxelized objects to be voxelized together, grouped by SURF_ID,
+        voxel size and other parameters.
+        @param context: the Blender context.
+        @return the lists of two or more objects sorted by name.
+        """
+        groups = dict()
+        for ob in self.collection.all_objects:
+            if (
+                ob.bf_is_tmp
+                or ob.type != "MESH"
+                or ob.hide_render
+                or ob.bf_namelist_cls != "ON_OBST"
+                or not ob.bf_xb_export
+                or ob.bf_xb != "VOXELS"
+                or ob.bf_xb_center_voxels  # not aligned to world origin
+                or ob.bf_xb_snap_to_mesh
+            ):
+                continue
+            key = (
+                OP_SURF_ID(ob).exported and ob.active_material.name,
+                geometry.calc_voxels.get_voxel_size(context, ob),
+                _to_fingerprint_value(ob.bf_other),
+            )
+            groups.setdefault(key, list()).append(ob)
+        groups = [obs for obs in groups.values() if len(obs) > 1]
+        for obs in groups:
+            obs.sort(key=lambda k: k.name)
+        return groups
+
+    def _get_union_voxels_namelists(self, context, groups) -> "names, namelists":
+        """!
+        Get the OBST namelists of touching voxelized objects, voxelized together.
+        @param context: the Blender context.
+        @param groups: the lists of objects, see _get_union_voxels_groups().
+        @return the names of the joined objects, and the FDSNamelist instances.
+        """
+        # Voxelize together, IDs are from the source objects of each xb
+        # eg. "Wall_3" from Wall only, "Wall+2_3" from Wall and two other objects
+        scale_length = self.unit_settings.scale_length
+        names, namelists = set(), list()
+        for obs in groups:
+            obs_by_name = {ob.name: ob for ob in obs}
+            unions = geometry.to_fds.obs_to_union_xbs(context, obs, scale_length)
+            for members, xbs, sources, msg in unions:
+                names.update(members)
+                ob = obs_by_name[members[0]]
+                ids = (
+                    f"{s[0]}+{len(s) - 1}_{i}" if len(s) > 1 else f"{s[0]}_{i}"
+                    for i, s in enumerate(sources)
+                )
+                multi = tuple(
+                    (
+                        FDSParam(fds_label="ID", values=(hid,)),
+                        FDSParam(fds_label="XB", values=xb, precision=6),
+                    )
+                    for hid, xb in zip(ids, xbs)
+                )
+                multi[0][0].msg = msg
+                namelists.append(
+                    FDSNamelist(
+                        fds_label="OBST",
+                        fds_params=[
+                            multi,
+                            OP_SURF_ID(ob).to_fds_param(context),
+                            OP_other(ob).to_fds_param(context),
+                        ],
+                        msg=f"Union of <{', '.join(members)}>",
+                    )
+                )
+        return names, namelists
 
-    def from_fds(self, context, fds_case):
+    def from_fds(self, context, fds_case=None, fds_namelists=None):
         """!
-        Set self.bf_namelists from FDSCase, on error raise BFException.
+        Set self.bf_namelists from FDSCase or FDSNamelist iterable, on error raise BFException.
         @param context: the Blender context.
         @param fds_case: FDSCase.
+        @param fds_namelists: iterable of FDSNamelist, eg. from iter_fds_namelists, used once.
         """
+        if fds_namelists is None:
+            fds_namelists = fds_case.fds_namelists
         self.set_default_appearance(context)  # current scene
         fds_case_un = FDSCase()  # unmanaged namelists
-        # Import SURFs first TODO improve, repetition!
-        # TODO if a material is not available, throw an Exception!
-        for fds_namelist in fds_case.fds_namelists:
-            if fds_namelist.fds_label != "SURF":
-                continue
-            hid = f"New {fds_namelist.fds_label}"
-            ma = bpy.data.materials.new(hid)
-            ma.from_fds(context, fds_namelist=fds_namelist)
-            ma.use_fake_user = True  # prevent del (eg. used by PART)
-            ma.set_default_appearance(context)
-        # Then the rest TODO improve
-        for fds_namelist in fds_case.fds_namelists:
+        # Import SURFs as they come, the namelists referring
+        # to still unknown SURFs are deferred
+        fds_namelists_deferred = list()
+        for fds_namelist in fds_namelists:
             if fds_namelist.fds_label == "SURF":
+                self._from_fds_namelist(context, fds_namelist, fds_case_un)
                 continue
-            # Get namelist class
-            bf_namelist = bf_namelists_by_fds_label.get(fds_namelist.fds_label, None)
-            if not bf_namelist:
-                # Put unmanaged namelists in fds_case_un
-                fds_case_un.fds_namelists.append(fds_namelist)
+            p = fds_namelist.get_fds_param_by_label("SURF_ID")
+            if p and any(
+                isinstance(v, str) and v not in bpy.data.materials for v in p.values
+            ):
+                fds_namelists_deferred.append(fds_namelist)
                 continue
-            # Prepare default name
-            hid = f"New {fds_namelist.fds_label}"
-            if bf_namelist.bpy_type == Object:  # new Object
-                me = bpy.data.meshes.new(hid)
-                ob = bpy.data.objects.new(hid, object_data=me)
-                self.collection.objects.link(ob)
-                ob.from_fds(context, fds_namelist=fds_namelist)
-                ob.set_default_appearance(context)
-            elif bf_namelist.bpy_type == Material:  # new Material
-                ma = bpy.data.materials.new(hid)
-                ma.from_fds(context, fds_namelist=fds_namelist)
-                ma.use_fake_user = (
-                    True  # prevent deletion if used by something else (eg. PART)
-                )
-                ma.set_default_appearance(context)
-            elif bf_namelist.bpy_type == Scene:  # current Scene
-                bf_namelist(self).from_fds(context, fds_namelist=fds_namelist)
+            self._from_fds_namelist(context, fds_namelist, fds_case_un)
+        for fds_namelist in fds_namelists_deferred:
+            self._from_fds_namelist(context, fds_namelist, fds_case_un)
         # Set imported Scene visible
         context.window.scene = self
         # Record unmanaged namelists in free text
@@ -3292,6 +3534,37 @@ class BFScene:
         # Set imported free text visible
         bpy.ops.scene.bf_show_text()
 
+    def _from_fds_namelist(self, context, fds_namelist, fds_case_un):
+        """!
+        Import one FDSNamelist to a new Object, Material or to self, on error raise BFException.
+        @param context: the Blender context.
+        @param fds_namelist: FDSNamelist.
+        @param fds_case_un: FDSCase collecting the unmanaged namelists.
+        """
+        # Get namelist class
+        bf_namelist = bf_namelists_by_fds_label.get(fds_namelist.fds_label, None)
+        if not bf_namelist:
+            # Put unmanaged namelists in fds_case_un
+            fds_case_un.fds_namelists.append(fds_namelist)
+            return
+        # Prepare default name
+        hid = f"New {fds_namelist.fds_label}"
+        if bf_namelist.bpy_type == Object:  # new Object
+            me = bpy.data.meshes.new(hid)
+            ob = bpy.data.objects.new(hid, object_data=me)
+            self.collection.objects.link(ob)
+            ob.from_fds(context, fds_namelist=fds_namelist)
+            ob.set_default_appearance(context)
+        elif bf_namelist.bpy_type == Material:  # new Material
+            ma = bpy.data.materials.new(hid)
+            ma.from_fds(context, fds_namelist=fds_namelist)
+            ma.use_fake_user = (
+                True  # prevent deletion if used by something else (eg. PART)
+            )
+            ma.set_default_appearance(context)
+        elif bf_namelist.bpy_type == Scene:  # current Scene
+            bf_namelist(self).from_fds(context, fds_namelist=fds_namelist)
+
     def to_ge1(self, context):
         """!
         Return the GE1 str representation of the geometry.
@@ -3322,8 +3595,10 @@ class BFScene:
         """
         Scene.bf_namelists = cls.bf_namelists
         Scene.to_fds = cls.to_fds
+        Scene.to_fds_stream = cls.to_fds_stream
         Scene.to_ge1 = cls.to_ge1
         Scene.from_fds = cls.from_fds
+        Scene._from_fds_namelist = cls._from_fds_namelist
         Scene.set_default_appearance = cls.set_default_appearance
 
     @classmethod
@@ -3333,8 +3608,10 @@ class BFScene:
         @param cls: class to be unregistered.
         """
         del Scene.set_default_appearance
+        del Scene._from_fds_namelist
         del Scene.from_fds
         del Scene.to_ge1
+        del Scene.to_fds_stream
         del Scene.to_fds
         del Scene.bf_namelists
 
@@ -3348,18 +3625,30 @@ class BFCollection:
         """!
         Return the FDS formatted string.
         @param context: the Blender context.
-        @param full: if True, return full FDS case.
         @return FDS formatted string, eg. "&OBST ID='Test' /".
         """
-        obs, lines = list(self.objects), list()
+        fh = io.StringIO()
+        self.to_fds_stream(context, fh)
+        return fh.getvalue()[1:]  # remove first newline
+
+    def to_fds_stream(self, context, fh, exclude=None):
+        """!
+        Write the FDS formatted string to a file handle, each namelist preceded by a newline.
+        @param context: the Blender context.
+        @param fh: writable text file handle.
+        @param exclude: names of the objects not to be written.
+        """
+        exclude = exclude or set()
+        obs = [ob for ob in self.objects if ob.name not in exclude]
         obs.sort(key=lambda k: k.name)  # alphabetic by name
         if obs:
-            lines.append(
-                f"\n! --- Geometric namelists from Blender Collection <{self.name}>"
+            fh.write(
+                f"\n\n! --- Geometric namelists from Blender Collection <{self.name}>"
             )
-            lines.extend(ob.to_fds(context) for ob in obs)
-        lines.extend(child.to_fds(context) for child in self.children)
-        return "\n".join(b for b in lines if b)  # remove empties
+            for ob in obs:
+                ob.to_fds_stream(context, fh)
+        for child in self.children:
+            child.to_fds_stream(context, fh, exclude=exclude)
 
     @classmethod
     def register(cls):
@@ -3368,6 +3657,7 @@ class BFCollection:
         @param cls: class to be registered.
         """
         Collection.to_fds = cls.to_fds
+        Collection.to_fds_stream = cls.to_fds_stream
 
     @classmethod
     def unregister(cls):
@@ -3375,6 +3665,7 @@ class BFCollection:
         Unregister related Blender properties.
         @param cls: class to be unregistered.
         """
+        del Collection.to_fds_stream
         del Collection.to_fds
 
 
@@ -14,7 +14,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import re, os.path, logging
+import re, io, os.path, gc, logging
+from array import array
+
+from . import utils
 
 import bpy
 from bpy.types import PropertyGroup, UIList, Object, Scene, Material
@@ -594,6 +597,22 @@ class BFNamelist(BFParam):
         else:  # single FDSNameslist
             return result.to_fds()
 
+    def to_fds_stream(self, context, fh):
+        """!
+        Write the FDS formatted string to a file handle, each namelist preceded by a newline.
+        @param context: the Blender context.
+        @param fh: writable text file handle.
+        """
+        result = self.to_fds_namelist(context)
+        if result is None:  # protect from None
+            return
+        if not is_iterable(result):  # single FDSNameslist
+            result = (result,)
+        for r in result:  # many (FDSNamelist, ...), multi not allowed!
+            if r is not None:
+                fh.write("\n")
+                r.to_fds_stream(fh)
+
     def from_fds(self, context, fds_namelist):
         """!
         Set self.bf_params values from list of FDSParam, on error raise BFException.
@@ -605,7 +624,7 @@ class BFNamelist(BFParam):
             if bf_param is None:
                 bf_param_other = self.bf_param_other
                 if bf_param_other:
-                    bf_param_other.set_value(context, value=str(p))
+                    bf_param_other.set_value(context, value=p.to_fds())
                 else:
                     raise BFException(self, f"Value {p} is not managed")
                 continue
@@ -656,6 +675,15 @@ class FDSParam:
     Python datastructure representing an FDS namelist parameter.
     """
 
+    __slots__ = (
+        "fds_label",
+        "_f90_source",
+        "_values",
+        "precision",
+        "exponential",
+        "msg",
+    )
+
     def __init__(
         self, fds_label, values=None, precision=3, exponential=False, msg=None
     ):
@@ -669,6 +697,8 @@ class FDSParam:
         """
         ## namelist parameter label
         self.fds_label = fds_label
+        ## FDS formatted source of the values, as (text, start, end), parsed on access.
+        self._f90_source = None
         ## list of parameter values of type float, int, str, bool.
         self.values = values or list()
         ## float precision, number of decimal digits.
@@ -678,17 +708,73 @@ class FDSParam:
         ## comment message.
         self.msg = msg
 
+    @classmethod
+    def _from_parsed(cls, fds_label, values, precision, exponential):
+        """!
+        Fast constructor from parsed values, eg. sent back by a parsing process.
+        @param fds_label: namelist parameter label.
+        @param values: tuple or typed array of parameter values, as set by from_fds().
+        @param precision: float precision, number of decimal digits.
+        @param exponential: if True sets exponential representation of floats.
+        @return FDSParam instance.
+        """
+        p = cls.__new__(cls)
+        p.fds_label = fds_label
+        p._f90_source = None
+        p._values = values
+        p.precision = precision
+        p.exponential = exponential
+        p.msg = None
+        return p
+
     def __str__(self):
         result = self.to_fds()
         if len(result) > 80:
             return result[:37] + " ... " + result[-37:]
         return result
 
+    @property
+    def values(self):
+        """!
+        Return the list of parameter values, parsing the FDS formatted source if needed.
+        """
+        if self._f90_source is not None:
+            f90_values, start, end = self._f90_source
+            # The values setter clears the source, kept on parsing error
+            self.from_fds(f90_values=f90_values[start:end])
+        return self._values
+
+    @values.setter
+    def values(self, values):
+        self._f90_source = None
+        # Long homogeneous lists of numbers are stored as typed arrays
+        if (
+            isinstance(values, (list, tuple))
+            and len(values) >= self._array_threshold
+        ):
+            t = type(values[0])
+            typecode = {float: "d", int: "q"}.get(t)
+            if typecode and all(type(v) is t for v in values):  # eg. no bool
+                try:
+                    values = array(typecode, values)
+                except OverflowError:  # too large int
+                    pass
+        self._values = values
+
     @property
     def formatted_values(self):
         """!
         Return the list of FDS formatted values, eg. "'Test1'","'Test2'"
         """
+        if self._f90_source is not None:  # unparsed, the source value tokens
+            f90_values, start, end = self._f90_source
+            f90_values = f90_values[start:end]
+            if not isinstance(f90_values, str):  # from mapped file
+                f90_values = utils.decode_text(f90_values)
+            return [  # separators and new lines are dropped
+                quoted or token
+                for quoted, token in self._scan_f90_tokens.findall(f90_values)
+            ]
         try:
             v0 = self.values[0]
         except IndexError:
@@ -696,7 +782,11 @@ class FDSParam:
         strings = list()
         if isinstance(v0, float):
             p = self.precision
-            if self.exponential:
+            if len(self.values) >= self._bulk_threshold:
+                strings.extend(
+                    self._bulk_format_floats(self.values, p, self.exponential)
+                )
+            elif self.exponential:
                 strings.extend(f"{round(v,p):.{p}E}" for v in self.values)
             else:
                 strings.extend(f"{round(v,p):.{p}f}" for v in self.values)
@@ -710,14 +800,34 @@ class FDSParam:
             raise ValueError(f"Unknown value type for parameter <{self.fds_label}>")
         return strings
 
+    ## min number of float values, to be formatted in bulk
+    _bulk_threshold = 32
+
+    @staticmethod
+    def _bulk_format_floats(values, p, exponential):
+        """!
+        Format all float values at once, with the same rules of formatted_values.
+        @param values: list or typed array of float values.
+        @param p: float precision, number of decimal digits.
+        @param exponential: if True sets exponential representation of floats.
+        @return list of FDS formatted values.
+        """
+        # One formatting operation for all values, correctly rounded as round(v, p)
+        strings = (f"%.{p}f\n" * len(values) % tuple(values)).split()
+        if exponential:  # round first, then format
+            strings = list(map(f"%.{p}E".__mod__, map(float, strings)))
+        return strings
+
     _re_decimal = r"\.([0-9]+)"  # decimal positions
 
     _scan_decimal = re.compile(_re_decimal, re.VERBOSE | re.DOTALL | re.IGNORECASE)
 
-    _re_integer = r"([0-9]*)\.?[0-9]*[eE]"  # integer postions of exp notation
+    _re_integer = r"(?<![0-9.])([0-9]*)\.?[0-9]*[eEdD]"  # integer postions of exp notation
 
     _scan_integer = re.compile(_re_integer, re.VERBOSE | re.DOTALL | re.IGNORECASE)
 
+    _scan_exponent = re.compile(r"[eEdD]")  # any exp notation
+
     def to_fds(self):
         """!
         Return the FDS formatted string.
@@ -728,40 +838,150 @@ class FDSParam:
             return self.fds_label
         return self.fds_label + "=" + v
 
-    def from_fds(self, f90_values):
+    # Fortran namelist literals
+
+    _re_f90_int = r"[+-]?[0-9]+"
+    _re_f90_float = (
+        r"[+-]?(?:(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eEdD][+-]?[0-9]+)?"
+        r"|[0-9]+[eEdD][+-]?[0-9]+)"
+    )
+
+    _scan_f90_int = re.compile(_re_f90_int)
+    _scan_f90_float = re.compile(_re_f90_float)
+    _scan_f90_number = re.compile(r"[^,\s]+")  # a number token
+    _scan_f90_int_number = re.compile(  # an int token
+        r"(?<![^,\s])[+-]?[0-9]+(?![^,\s])"
+    )
+    _scan_f90_not_number = re.compile(r"[^0-9eEdD.+\-,\s]")  # not in a number
+    _scan_f90_tokens = re.compile(  # groups: quoted str, other token
+        r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|([^,\s'"]+)"""
+    )
+    _scan_f90_repeat = re.compile(r"([0-9]+)\*(.+)", re.DOTALL)  # eg. 3*0.5
+
+    _f90_bools = {
+        "T": True,
+        ".T.": True,
+        ".TRUE.": True,
+        "F": False,
+        ".F.": False,
+        ".FALSE.": False,
+    }
+
+    ## min number of numeric values, to be stored in a typed array
+    _array_threshold = 32
+
+    @classmethod
+    def _f90_to_numbers(cls, f90_values):
+        """!
+        Bulk convert an FDS formatted list of homogeneous numbers, on error raise ValueError.
+        @param f90_values: FDS formatted string of numbers, eg. "1.2, 3.4 5.6".
+        @return tuple of numbers or, if long, typed array of numbers.
+        """
+        if cls._scan_f90_not_number.search(f90_values):
+            raise ValueError("Not a number")
+        scan = cls._scan_f90_number.finditer
+        try:
+            values = array("q", map(int, (m.group() for m in scan(f90_values))))
+        except ValueError:  # not all int
+            if cls._scan_f90_int_number.search(f90_values):
+                raise ValueError("Not homogeneous numbers")
+            if "d" in f90_values or "D" in f90_values:
+                f90_values = f90_values.replace("d", "e").replace("D", "e")
+            values = array("d", map(float, (m.group() for m in scan(f90_values))))
+        if not values:
+            raise ValueError("No value")
+        if len(values) < cls._array_threshold:
+            return tuple(values)
+        return values
+
+    @classmethod
+    def _f90_to_value(cls, token):
+        """!
+        Convert an FDS formatted single value.
+        @param token: FDS formatted value, eg. "'Test'", "1.2", ".TRUE.".
+        @return tuple of converted values, more than one if a repeat count is used.
+        """
+        if token[0] in ("'", '"'):  # doubled quotes escape the quote
+            return (token[1:-1].replace(token[0] * 2, token[0]),)
+        value = cls._f90_bools.get(token.upper())
+        if value is not None:
+            return (value,)
+        if cls._scan_f90_int.fullmatch(token):
+            return (int(token),)
+        if cls._scan_f90_float.fullmatch(token):
+            return (float(token.replace("d", "e").replace("D", "e")),)
+        match = cls._scan_f90_repeat.fullmatch(token)
+        if match:  # eg. 3*0.5
+            return cls._f90_to_value(match.group(2)) * int(match.group(1))
+        raise ValueError(f"Unknown value <{token}>")
+
+    @classmethod
+    def _f90_to_values(cls, f90_values):
+        """!
+        Convert an FDS formatted string of values, on error raise ValueError.
+        @param f90_values: FDS formatted string of values, eg. "2.34, 1.23, 3.44" or ".TRUE.,.FALSE.".
+        @return tuple or typed array of values of type float, int, str, bool.
+        """
+        # Fast path, lists of homogeneous numbers
+        try:
+            return cls._f90_to_numbers(f90_values)
+        except (ValueError, OverflowError):
+            pass
+        # Any other value
+        values = list()
+        pos = 0
+        for match in cls._scan_f90_tokens.finditer(f90_values):
+            if f90_values[pos : match.start()].strip(", \t\r\n"):
+                raise ValueError(f"Unknown value <{f90_values[pos:match.start()]}>")
+            pos = match.end()
+            quoted, token = match.groups()
+            if quoted:  # doubled quotes escape the quote
+                values.append(quoted[1:-1].replace(quoted[0] * 2, quoted[0]))
+            else:
+                values.extend(cls._f90_to_value(token))
+        if f90_values[pos:].strip(", \t\r\n"):
+            raise ValueError(f"Unknown value <{f90_values[pos:]}>")
+        if not values:
+            raise ValueError("No value")
+        return tuple(values)
+
+    def from_fds(self, f90_values, pos=0, endpos=None, lazy=False):
         """!
         Import from FDS formatted string of values, on error raise BFException.
         @param f90_values: FDS formatted string of values, eg. "2.34, 1.23, 3.44" or ".TRUE.,.FALSE.".
+        @param pos: start of the values view in f90_values.
+        @param endpos: end of the values view in f90_values.
+        @param lazy: if True, only keep the view and parse the values on first access.
         """
-        f90_values += ","  # always return a tuple, eg. "34" -> "34,"
-        # Translate F90 booleans
-        if f90_values[0] == ".":
-            f90_values = (
-                f90_values.upper().replace(".TRUE.", "True").replace(".FALSE.", "False")
-            )
-        elif f90_values[0] in ("T", "F"):
-            f90_values = f90_values.upper().replace("T", "True").replace("F", "False")
-        # Python evaluation of F90 value, after cleaning from \n \r
-        f90_values = " ".join(f90_values.split())
+        if lazy:
+            if endpos is None:
+                endpos = len(f90_values)
+            self._f90_source = f90_values, pos, endpos
+            self._values = None
+            return
+        if pos or endpos is not None:
+            f90_values = f90_values[pos:endpos]
+        if not isinstance(f90_values, str):  # from mapped file
+            f90_values = utils.decode_text(f90_values)
         try:
-            self.values = eval(f90_values)
-        except Exception as err:
+            self.values = self._f90_to_values(f90_values)
+        except ValueError as err:
+            f90_values = " ".join(f90_values.split())
             raise BFException(
                 self,
                 f"Parsing error in parameter <{self.fds_label}={f90_values} ... />\n{err}",
             )
-        # Get precision from the first f90 float value
+        # Get precision from the f90 float values, in bulk
         if isinstance(self.values[0], float):
-            match = re.findall(self._re_decimal, f90_values)
-            if match:
-                self.precision = max(len(m) for m in match)
-            else:
-                self.precision = 1
+            self.precision = max(
+                map(len, self._scan_decimal.findall(f90_values)), default=1
+            )
             # Exp notation?
-            match = re.findall(self._re_integer, f90_values)
-            if match:
-                self.exponential = True
-                self.precision += max(len(m) for m in match) - 1
+            if self._scan_exponent.search(f90_values):
+                n = max(map(len, self._scan_integer.findall(f90_values)), default=None)
+                if n is not None:
+                    self.exponential = True
+                    self.precision += n - 1
 
 
 class FDSNamelist:
@@ -769,6 +989,8 @@ class FDSNamelist:
     Python datastructure representing an FDS namelist.
     """
 
+    __slots__ = ("fds_label", "fds_params", "msg")
+
     ## max number of columns of formatted output
     maxlen = 80  # TODO to config
 
@@ -806,6 +1028,20 @@ class FDSNamelist:
         Return the FDS formatted string.
         @return FDS formatted string, eg. "&OBST ID='Test' /".
         """
+        return "".join(self._to_fds_chunks())
+
+    def to_fds_stream(self, fh):
+        """!
+        Write the FDS formatted string to a file handle.
+        @param fh: writable text file handle.
+        """
+        fh.writelines(self._to_fds_chunks())
+
+    def _to_fds_chunks(self):
+        """!
+        Return the FDS formatted string, as a list of chunks.
+        @return list of str.
+        """
         # Mix parameters
         invps = list()  # invariant parameters
         multips = list()  # multi parameters
@@ -845,91 +1081,138 @@ class FDSNamelist:
                 nls.append(nl)
         else:
             nls.append(invps)
-        # Prepare strings
-        lines = list(f"! {m}" for m in msgs if m)  # all messages
+        # Prepare strings, as a list of chunks and the current column
+        maxlen = self.maxlen
+        chunks = list()
+        for m in msgs:  # all messages
+            if m:
+                chunks.extend(("! ", m, "\n"))
         for nl in nls:
             newline = False
-            line = "&" + self.fds_label
+            chunks.extend(("&", self.fds_label))
+            col = 1 + len(self.fds_label)
             for p in nl:
                 label = p.fds_label
                 vs = p.formatted_values  # list of str
                 if not vs:  # no values
-                    if not newline and len(line) + 1 + len(label) <= self.maxlen:
+                    if not newline and col + 1 + len(label) <= maxlen:
                         # Parameter to the same line
-                        newline = False
-                        line += " " + label
+                        chunks.extend((" ", label))
+                        col += 1 + len(label)
                     else:
                         # Parameter to new line
-                        lines.append(line)
-                        line = "      " + label  # new line
-                else:  # values
-                    v = ",".join(vs)  # values str
-                    if (
-                        not newline
-                        and len(line) + 1 + len(label) + 1 + len(v) <= self.maxlen
-                    ):
-                        # Parameter to the same line
-                        newline = False
-                        line += " " + label + "=" + v
+                        chunks.extend(("\n      ", label))
+                        col = 6 + len(label)
+                    continue
+                # Values
+                vlen = sum(map(len, vs)) + len(vs) - 1  # values str len
+                if not newline and col + 1 + len(label) + 1 + vlen <= maxlen:
+                    # Parameter to the same line
+                    chunks.extend((" ", label, "=", ",".join(vs)))
+                    col += 1 + len(label) + 1 + vlen
+                    continue
+                # Parameter to new line
+                chunks.extend(("\n      ", label, "="))
+                col = 6 + len(label) + 1
+                if col + vlen <= maxlen:
+                    # Values do not need splitting
+                    chunks.append(",".join(vs))
+                    col += vlen
+                    continue
+                # Values need splitting
+                newline = True  # the following needs a new line
+                for v in vs:
+                    if col + len(v) + 1 <= maxlen:
+                        chunks.extend((v, ","))
+                        col += len(v) + 1
                     else:
-                        # Parameter to new line
-                        lines.append(line)
-                        line = "      " + label + "="  # new line
-                        if len(line) + len(v) <= self.maxlen:
-                            # Values do not need splitting
-                            line += v
-                        else:
-                            # Values need splitting
-                            newline = True  # the following needs a new line
-                            for v in vs:
-                                if len(line) + len(v) + 1 <= self.maxlen:
-                                    line += v + ","
-                                else:
-                                    lines.append(line)
-                                    line = "        " + v + ","  # new line
-                            line = line[:-1]  # remove last ","
-            line += " /"
-            lines.append(line)
-        return "\n".join(lines)
+                        chunks.extend(("\n        ", v, ","))  # new line
+                        col = 8 + len(v) + 1
+                chunks.pop()  # remove last ","
+                col -= 1
+            chunks.append(" /\n")
+        chunks[-1] = chunks[-1][:-1]  # remove last "\n"
+        return chunks
 
     _re_label = r"([A-Z][A-Z0-9_\(\):,]*?)"  # param label w indexes
     _re_space = r"[\s\t]*"  # zero or more spaces
     _re_sep = r"[,\s\t]+"  # one or more separators
-    _re_end = r"[,\s\t]*/"  # zero or more separators + "/"
-    _re_values = (
-        r"("
-        + "'[^']+'" # any character between '
-        + "|"  # or
-        + ".+?"  # one or more of any char, not greedy
-        + "(?="  # end previous match when
-        + _re_sep
-        + _re_label  # either a new label
-        + _re_space
-        + "="  # followed by an equal sign
-        + "|"  # or
-        + _re_end  # the end of the namelist
-        + "))"
+    _re_param = _re_label + _re_space + "=" + _re_space  # group: label
+    _re_quoted = r"'[^']*'|\"[^\"]*\"|"  # either a quoted string, to be skipped
+    _re_first_param = _re_quoted + _re_param  # or a param
+    _re_next_param = _re_quoted + _re_sep + _re_param  # or a separator and a param
+    _re_value = r"'[^']*'|\"[^\"]*\"|."  # a quoted string or a char
+
+    _scan_first_param = re.compile(_re_first_param, re.DOTALL | re.IGNORECASE)
+    _scan_next_param = re.compile(_re_next_param, re.DOTALL | re.IGNORECASE)
+    _scan_value = re.compile(_re_value, re.DOTALL)
+
+    _scan_first_param_bytes = re.compile(
+        _re_first_param.encode(), re.DOTALL | re.IGNORECASE
     )
-    _re_param = (
-        _re_label + _re_space + "=" + _re_space + _re_values
-    )  # groups: label, vals
-
-    _scan = re.compile(
-        _re_param, re.VERBOSE | re.DOTALL | re.IGNORECASE
-    )  # no MULTILINE, so that $ is the end of the file
+    _scan_next_param_bytes = re.compile(
+        _re_next_param.encode(), re.DOTALL | re.IGNORECASE
+    )
+    _scan_value_bytes = re.compile(_re_value.encode(), re.DOTALL)  # for mapped files
 
-    def from_fds(self, f90_params):  # TODO change signature: f90_namelist
+    @staticmethod
+    def _search_param(scan, f90_params, pos, endpos):
+        """!
+        Search the next param label, skipping quoted strings.
+        @param scan: compiled regex, its group 1 is the label.
+        @param f90_params: FDS formatted string of parameters.
+        @param pos: start of the search.
+        @param endpos: end of the search.
+        @return None or the regex match.
+        """
+        match = scan.search(f90_params, pos, endpos)
+        while match and match.group(1) is None:  # quoted string
+            match = scan.search(f90_params, match.end(), endpos)
+        return match
+
+    def from_fds(
+        self, f90_params, pos=0, endpos=None, lazy=False
+    ):  # TODO change signature: f90_namelist
         """!
         Import from FDS formatted string of parameters, on error raise BFException.
         @param f90_params: FDS formatted string of parameters, eg. "ID='Test' PROP=2.34, 1.23, 3.44".
+        @param pos: start of the parameters view in f90_params.
+        @param endpos: end of the parameters view in f90_params, the closing "/" excluded.
+        @param lazy: if True, parameter values are parsed on first access.
         """
-        for match in re.finditer(self._scan, f90_params):
-            label, f90_values, following_label = match.groups()
-            p = FDSParam(fds_label=label)
-            p.from_fds(f90_values=f90_values)
-            self.fds_params.append(p)
-            if following_label is None:
+        if endpos is None:
+            endpos = len(f90_params)
+        if isinstance(f90_params, str):
+            scan_first_param, scan_next_param, scan_value = (
+                self._scan_first_param,
+                self._scan_next_param,
+                self._scan_value,
+            )
+            seps, decode = ", \t\r\n", str
+        else:  # from mapped file
+            scan_first_param, scan_next_param, scan_value = (
+                self._scan_first_param_bytes,
+                self._scan_next_param_bytes,
+                self._scan_value_bytes,
+            )
+            seps, decode = b", \t\r\n", bytes.decode
+        # Each param values end at the first separator followed by a new param,
+        # the walk is linear and regex memory does not depend on values length
+        match = self._search_param(scan_first_param, f90_params, pos, endpos)
+        while match:
+            label, start = match.group(1), match.end()
+            value = scan_value.match(f90_params, start, endpos)  # at least one
+            if not value:
                 break
+            match = self._search_param(
+                scan_next_param, f90_params, value.end(), endpos
+            )
+            end = match.start() if match else endpos
+            while end > start and f90_params[end - 1 : end] in seps:
+                end -= 1
+            p = FDSParam(fds_label=decode(label))
+            p.from_fds(f90_values=f90_params, pos=start, endpos=end, lazy=lazy)
+            self.fds_params.append(p)
 
 
 class FDSCase:
@@ -964,23 +1247,194 @@ class FDSCase:
             n.to_fds() for n in self.fds_namelists if n is not None
         )  # Protect None
 
-    _scan = re.compile(
-        r"""
+    _re_label = r"""
         (?:^&)             # & at the beginning
         ([A-Z]+[A-Z0-9]*)  # namelist label
-        """,
-        re.VERBOSE | re.DOTALL | re.IGNORECASE | re.MULTILINE,
+        """
+
+    _re_end = r"""
+        ('[^']*'|"[^"]*")  # either a quoted string, to be skipped
+        |(/)               # or the closing /
+        |['"]              # or an unclosed quote
+        """
+
+    _scan = re.compile(
+        _re_label, re.VERBOSE | re.DOTALL | re.IGNORECASE | re.MULTILINE
     )  # MULTILINE, so that ^ is the beginning of each line
 
-    def from_fds(self, f90_namelists, reset=True):
+    _scan_end = re.compile(_re_end, re.VERBOSE | re.DOTALL)
+
+    _scan_bytes = re.compile(
+        _re_label.encode(), re.VERBOSE | re.DOTALL | re.IGNORECASE | re.MULTILINE
+    )  # same, for mapped files
+
+    _scan_end_bytes = re.compile(_re_end.encode(), re.VERBOSE | re.DOTALL)
+
+    @classmethod
+    def _scan_f90_namelists(cls, f90_namelists, pos=0):
         """!
-        Import from FDS formatted string of namelists, on error raise BFException.
+        Walk once the FDS formatted string of namelists and yield their views.
         @param f90_namelists: FDS formatted string of namelists, eg. "&OBST ID='Test' /\n&TAIL /".
+        @param pos: start position of the walk.
+        @return generator of (label, start, end) tuples, where start and end bound
+                the namelist parameters, and end is None if the namelist is not closed.
+        """
+        if isinstance(f90_namelists, str):
+            scan, scan_end, decode = cls._scan, cls._scan_end, str
+        else:  # from mapped file
+            scan, scan_end, decode = cls._scan_bytes, cls._scan_end_bytes, bytes.decode
+        while True:
+            match = scan.search(f90_namelists, pos)
+            if match is None:
+                return
+            label, start = decode(match.group(1)), match.end()
+            match = scan_end.search(f90_namelists, start)
+            while match and match.group(1):  # skip quoted strings
+                match = scan_end.search(f90_namelists, match.end())
+            if not (match and match.group(2)):  # not closed
+                yield label, start, None
+                return
+            end = match.start(2)
+            yield label, start, end
+            pos = end + 1
+
+    ## min size of the text sent to each parsing process
+    _chunk_size = 1 << 16
+
+    def from_fds(self, f90_namelists, reset=True, lazy=False, processes=1):
+        """!
+        Import from FDS formatted string of namelists, on error raise BFException.
+        @param f90_namelists: FDS formatted string of namelists, eg. "&OBST ID='Test' /\n&TAIL /",
+                or bytes-like object, eg. a mapped file.
         @param reset: if True, reset self.fds_namelists to empty list before importing.
+        @param lazy: if True, parameter values are parsed on first access.
+        @param processes: if more than one and not lazy, parse in parallel with this number of processes.
         """
         if reset:
             self.fds_namelists = list()
-        for match in re.finditer(self._scan, f90_namelists):
-            nl = FDSNamelist(fds_label=match.groups()[0])
-            nl.from_fds(f90_params=f90_namelists[match.end() :])
+        if not lazy and processes > 1 and len(f90_namelists) > self._chunk_size:
+            pool = utils.get_process_pool(processes)
+            if pool:
+                with pool:
+                    fds_namelists = self._from_fds_parallel(
+                        f90_namelists, pool, processes
+                    )
+                if fds_namelists is not None:
+                    self.fds_namelists.extend(fds_namelists)
+                    return
+        for label, start, end in self._scan_f90_namelists(f90_namelists):
+            nl = FDSNamelist(fds_label=label)
+            nl.from_fds(f90_params=f90_namelists, pos=start, endpos=end, lazy=lazy)
             self.fds_namelists.append(nl)
+
+    def _from_fds_parallel(self, f90_namelists, pool, processes):
+        """!
+        Parse FDS formatted string of namelists in parallel, on error raise BFException.
+        @param f90_namelists: FDS formatted string of namelists, or bytes-like object.
+        @param pool: the process pool.
+        @param processes: number of processes.
+        @return list of FDSNamelist instances, or None if the chunks cannot be parsed apart.
+        """
+        # Cut in about four chunks per process, at line starts with "&"
+        size = len(f90_namelists)
+        chunk_size = max(size // (processes * 4), self._chunk_size)
+        cut = isinstance(f90_namelists, str) and "\n&" or b"\n&"
+        chunks, chunk_start = list(), 0
+        while chunk_start < size:
+            chunk_end = f90_namelists.find(cut, chunk_start + chunk_size) + 1 or size
+            chunks.append(f90_namelists[chunk_start:chunk_end])
+            chunk_start = chunk_end
+        # Parse, in order, then only build the namelists from the parsed values.
+        # The many new objects hold no cycles, so the collector is paused
+        fds_namelists, gc_enabled = list(), gc.isenabled()
+        gc.disable()
+        try:
+            for i, (f90_nls, closed, msg) in enumerate(
+                pool.map(_parse_f90_namelists, chunks)
+            ):
+                if not closed and i < len(chunks) - 1:  # cut inside a namelist
+                    return None
+                if msg:
+                    raise BFException(self, msg)
+                for label, f90_ps in f90_nls:
+                    fds_params = [FDSParam._from_parsed(*p) for p in f90_ps]
+                    fds_namelists.append(
+                        FDSNamelist(fds_label=label, fds_params=fds_params)
+                    )
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return fds_namelists
+
+
+def _parse_f90_namelists(f90_namelists):
+    """!
+    Parse FDS formatted string of namelists, in a worker process.
+    Only primitive types and typed arrays are sent back, that are cheap to pickle.
+    @param f90_namelists: FDS formatted string of namelists, or bytes.
+    @return [(label, [(fds_label, values, precision, exponential), ...]), ...],
+            True if the last namelist is closed, and None or the error message.
+    """
+    fds_case, closed = FDSCase(), True
+    try:
+        for label, start, end in FDSCase._scan_f90_namelists(f90_namelists):
+            closed = end is not None
+            nl = FDSNamelist(fds_label=label)
+            nl.from_fds(f90_params=f90_namelists, pos=start, endpos=end)
+            fds_case.fds_namelists.append(nl)
+    except BFException as err:  # not picklable
+        return None, closed, err.msg
+    f90_nls = [
+        (
+            nl.fds_label,
+            [
+                (p.fds_label, p.values, p.precision, p.exponential)
+                for p in nl.fds_params
+            ],
+        )
+        for nl in fds_case.fds_namelists
+    ]
+    return f90_nls, closed, None
+
+
+def iter_fds_namelists(path_or_stream, lazy=False, chunk_size=1 << 20):
+    """!
+    Read FDS formatted namelists in chunks and yield them one at a time, on error raise BFException.
+    @param path_or_stream: filepath, or binary or text stream, eg. an open or mapped file.
+    @param lazy: if True, parameter values are parsed on first access.
+    @param chunk_size: min size of each read from the stream.
+    @return generator of FDSNamelist instances.
+    """
+    if isinstance(path_or_stream, (str, os.PathLike)):
+        with utils.map_file(path_or_stream) as f:
+            yield from iter_fds_namelists(f, lazy=lazy, chunk_size=chunk_size)
+        return
+    stream = path_or_stream
+    if not hasattr(stream, "read"):  # bytes-like, eg. an empty mapped file
+        stream = io.BytesIO(stream)
+    buffer = stream.read(chunk_size)
+    newline = isinstance(buffer, str) and "\n" or b"\n"
+    pos, eof = 0, not buffer
+    while True:
+        # Read more, the buffer is always trimmed at a line start, so ^ still matches
+        if not eof and pos:
+            cut = buffer.rfind(newline, 0, pos) + 1
+            buffer, pos = buffer[cut:], pos - cut
+        if not eof:
+            chunk = stream.read(max(chunk_size, len(buffer)))  # grow for long namelists
+            eof = not chunk
+            buffer += chunk
+        # Yield the closed namelists, the last open one waits for more
+        for label, start, end in FDSCase._scan_f90_namelists(buffer, pos):
+            if end is None and not eof:
+                break
+            nl = FDSNamelist(fds_label=label)
+            nl.from_fds(f90_params=buffer[start:end], lazy=lazy)
+            yield nl
+            if end is None:
+                break
+            pos = end + 1
+        else:  # no open namelist, skip to the last line start
+            pos = max(pos, buffer.rfind(newline) + 1)
+        if eof:
+            return
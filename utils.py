@@ -14,7 +14,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import os
+import os, sys, mmap, multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 
 
 def is_iterable(var):
@@ -59,6 +61,29 @@ def write_to_file(filepath, text=None):
         return True
 
 
+@contextmanager
+def open_to_write(filepath):
+    """!
+    Open text file to filepath for writing, to be used as context manager.
+    Write to a tmp file first, that replaces filepath only when complete.
+    """
+    tmp_filepath = f"{filepath}.tmp"
+    try:
+        f = open(tmp_filepath, "w", encoding="utf8", errors="ignore")
+    except Exception as err:
+        raise IOError(f"File not writable: {err}")
+    try:
+        with f:
+            yield f
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_filepath)
+        except OSError:
+            pass
+        raise
+
+
 def read_from_file(filepath):
     """!
     Read text file from filepath.
@@ -80,6 +105,60 @@ def read_from_file(filepath):
     raise IOError("File not readable, unknown text encoding")
 
 
+@contextmanager
+def map_file(filepath):
+    """!
+    Memory map file from filepath, read only, to be used as context manager.
+    An empty file is mapped to empty bytes.
+    """
+    try:
+        f = open(filepath, "rb")
+    except Exception as err:
+        raise IOError(f"File not readable: {err}")
+    with f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file, cannot be mapped
+            m = None
+        if m is None:
+            yield bytes()
+        else:
+            with m:
+                yield m
+
+
+def decode_text(data):
+    """!
+    Decode bytes of text, with the same encodings of read_from_file.
+    """
+    try:
+        return str(data, encoding="utf8")
+    except UnicodeDecodeError:
+        pass
+    try:
+        return str(data, encoding="windows-1252")
+    except UnicodeDecodeError:
+        return str(data, encoding="utf8", errors="ignore")
+
+
+# Processes
+
+
+def get_process_pool(processes):
+    """!
+    Return a process pool of forked workers, or None if fork is not available.
+    Forked workers inherit the loaded modules, so no module is imported again.
+    Forking Blender is tested on Linux only, and unsafe on macOS.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        mp_context = multiprocessing.get_context("fork")
+    except ValueError:  # eg. on Windows
+        return None
+    return ProcessPoolExecutor(max_workers=processes, mp_context=mp_context)
+
+
 # TODO move to config with other data tables
 ## Color table from FDS source code (data.f90)
 fds_colors = {